@@ -0,0 +1,159 @@
+"""
+Time each codemod on its own, on a fixed synthetic package, and compare the times with a baseline.
+
+Each rule's codemod runs alone on the modules where `gather_codemods` would run it, on their original content. Its
+time is the time of its hooks, including the matchers, and of resolving the metadata it depends on: the traversal
+of the tree and the import visitors that run after it are shared by all the codemods, so they're left out. The
+import visitors are timed the same way, on the output of the rules' codemods, with the imports they registered.
+
+`--save-baseline` writes the times to a JSON file. With `--baseline`, the command fails if a codemod is slower than
+in the baseline by more than the tolerance, e.g. after adding a slow matcher to a rule. The baseline needs to be
+recorded on the same machine, with the same Python and libcst.
+"""
+
+import copy
+import json
+import statistics
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+import libcst as cst
+import typer
+from libcst.codemod import Codemod, ContextAwareTransformer
+from libcst.metadata import FullRepoManager
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.generate import PACKAGE, Shape
+from benchmarks.run import Benchmark, chdir
+from bump_pydantic.codemods import RULE_BY_CODEMOD, gather_codemods, gather_passes
+from bump_pydantic.codemods.fused import FusedCodemod
+from bump_pydantic.executor import Executor, Workers
+from bump_pydantic.main import codemod_context, parse_module
+
+FIXTURE = Shape(modules=10, models=10, depth=5, plain=0.1, seed=0)
+"""The package the codemods run on. Changing it invalidates the baselines."""
+
+app = typer.Typer(add_completion=False)
+
+
+@dataclass
+class Input:
+    """What a codemod needs to run on a module."""
+
+    filename: str
+    tree: cst.Module
+    scratch: Dict[str, Any]
+
+
+def prepare_inputs(benchmark: Benchmark) -> Dict[Type[ContextAwareTransformer], List[Input]]:
+    """Parse the modules, and find the input of each codemod on the modules it runs on.
+
+    The rules' codemods run on the original modules. The import visitors run on the modules changed by all the
+    rules' codemods, after each other, like in `transform_code()`.
+    """
+    inputs: Dict[Type[ContextAwareTransformer], List[Input]] = {}
+    for filename in benchmark.files:
+        code = Path(filename).read_text(encoding="utf-8")
+        has_models = bool(benchmark.models.get(filename))
+        codemods = gather_codemods([], code.encode("utf-8"), has_models=has_models)
+        tree = parse_module(filename, code)
+        context = codemod_context(benchmark.metadata_manager, benchmark.scratch, Path(PACKAGE), filename)
+        output_tree = tree
+        for codemods_pass in gather_passes(codemods):
+            for codemod in codemods_pass:
+                if codemod in RULE_BY_CODEMOD:
+                    inputs.setdefault(codemod, []).append(Input(filename, tree, benchmark.scratch))
+                else:
+                    inputs.setdefault(codemod, []).append(Input(filename, output_tree, copy.deepcopy(context.scratch)))
+            # NOTE: `Codemod.transform_module()` doesn't run the import visitors, unlike the `CodemodCommand`.
+            output_tree = Codemod.transform_module(FusedCodemod(context, codemods_pass), output_tree)
+    return inputs
+
+
+def time_codemod(
+    codemod: Type[ContextAwareTransformer], inputs: List[Input], metadata_manager: FullRepoManager
+) -> float:
+    """Run the codemod on each input, and return the time of its hooks and of resolving its metadata."""
+    timings: Dict[str, float] = {}
+    for codemod_input in inputs:
+        scratch = copy.deepcopy(codemod_input.scratch)
+        context = codemod_context(metadata_manager, scratch, Path(PACKAGE), codemod_input.filename)
+        Codemod.transform_module(FusedCodemod(context, [codemod], timings=timings), codemod_input.tree)
+    return timings.get(codemod.__name__, 0.0) + timings.get("metadata", 0.0)
+
+
+def run_benchmarks(repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir, chdir(Path(tmp_dir)):
+        benchmark = Benchmark(Path(tmp_dir), FIXTURE, Workers(Executor.SERIAL))
+        benchmark.discover()
+        inputs = prepare_inputs(benchmark)
+        for codemod in gather_codemods([]):
+            codemod_inputs = inputs.get(codemod, [])
+            times = [time_codemod(codemod, codemod_inputs, benchmark.metadata_manager) for _ in range(repeat)]
+            rule = RULE_BY_CODEMOD.get(codemod)
+            results.append(
+                {
+                    "codemod": codemod.__name__,
+                    "rule": rule.value if rule is not None else None,
+                    "files": len(codemod_inputs),
+                    "times": times,
+                }
+            )
+    return results
+
+
+def read_baseline(path: Path) -> Dict[str, float]:
+    """Return the best time of each codemod in the baseline."""
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    if baseline.get("fixture") != asdict(FIXTURE):
+        raise typer.BadParameter("The baseline was recorded on another fixture.", param_hint="'--baseline'")
+    return {result["codemod"]: min(result["times"]) for result in baseline["results"]}
+
+
+@app.command()
+def main(
+    repeat: int = typer.Option(3, min=1, help="Number of times each codemod runs."),
+    baseline: Optional[Path] = typer.Option(None, exists=True, dir_okay=False, help="Compare with this baseline."),
+    tolerance: float = typer.Option(0.2, min=0, help="Maximum slowdown compared to the baseline, e.g. 0.2 for 20%."),
+    save_baseline: Optional[Path] = typer.Option(None, help="Write the times to this JSON file, as a baseline."),
+) -> None:
+    """Time each codemod on its own, and compare the times with a baseline."""
+    baseline_times = read_baseline(baseline) if baseline is not None else {}
+
+    console = Console()
+    with console.status("Benchmarking the codemods..."):
+        results = run_benchmarks(repeat)
+
+    table = Table("Codemod", "Rule", "Files", "Best (s)", "Median (s)")
+    if baseline is not None:
+        table.add_column("Baseline (s)")
+        table.add_column("Change")
+    regressions = []
+    for result in results:
+        best = min(result["times"])
+        median = statistics.median(result["times"])
+        row = [result["codemod"], result["rule"] or "", str(result["files"]), f"{best:.3f}", f"{median:.3f}"]
+        previous = baseline_times.get(result["codemod"])
+        if previous:
+            change = best / previous - 1
+            if change > tolerance:
+                regressions.append(result["codemod"])
+            row += [f"{previous:.3f}", f"[{'red' if change > tolerance else 'green'}]{change:+.0%}"]
+        table.add_row(*row)
+    console.print(table)
+
+    if save_baseline is not None:
+        report = {"environment": {"python": sys.version}, "fixture": asdict(FIXTURE), "results": results}
+        save_baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if regressions:
+        console.print(f"[red]Slower than the baseline by more than {tolerance:.0%}: {', '.join(regressions)}.")
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
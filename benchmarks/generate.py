@@ -0,0 +1,213 @@
+"""
+Generate a synthetic package that uses Pydantic V1, to benchmark bump-pydantic on codebases of any size.
+
+The package is split in subpackages of up to 100 modules. Each module defines some models that inherit from the
+models of the previous modules, so the class hierarchy spans many modules, and uses the features that the rules
+migrate: `Config` classes, validators, `con*` types, `Field` parameters, and optional fields without default. A few
+modules also use generic models, custom root types and custom types, and some don't use Pydantic at all, like in
+most real codebases.
+
+The output only depends on the parameters, so the benchmarks of different versions can be compared.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
+import typer
+
+PACKAGE = "synthetic"
+MODULES_PER_SUBPACKAGE = 100
+RARE_FEATURES = 0.2
+"""The fraction of the modules that use Pydantic, that also use generic models, custom root types and custom types."""
+
+
+@dataclass
+class Shape:
+    modules: int = 100
+    """The number of modules."""
+    models: int = 5
+    """The number of models defined in each module that uses Pydantic."""
+    depth: int = 5
+    """The number of modules that each inheritance chain crosses."""
+    plain: float = 0.3
+    """The fraction of the modules that don't use Pydantic."""
+    seed: int = 0
+
+
+def module_name(index: int) -> str:
+    return f"{PACKAGE}.pkg_{index // MODULES_PER_SUBPACKAGE:03}.mod_{index:05}"
+
+
+def module_path(root: Path, index: int) -> Path:
+    return root.joinpath(*module_name(index).split(".")).with_suffix(".py")
+
+
+def generate_package(root: Path, shape: Shape) -> list[Path]:
+    """Write the package inside `root`, and return the paths of its modules."""
+    rng = random.Random(shape.seed)
+    paths: list[Path] = []
+    pydantic_modules: list[int] = []
+    for index in range(shape.modules):
+        path = module_path(root, index)
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+            for package in (path.parent, path.parent.parent):
+                (package / "__init__.py").touch()
+        if rng.random() < shape.plain:
+            path.write_text(plain_module(index), encoding="utf-8")
+        else:
+            # NOTE: The first model of each module inherits from a model of the previous module that uses Pydantic,
+            # except at the start of each chain.
+            parent = pydantic_modules[-1] if pydantic_modules and len(pydantic_modules) % shape.depth else None
+            path.write_text(pydantic_module(index, shape.models, parent, rng), encoding="utf-8")
+            pydantic_modules.append(index)
+        paths.append(path)
+    return paths
+
+
+def pydantic_module(index: int, models: int, parent: int | None, rng: random.Random) -> str:
+    # NOTE: Some modules also use the features that are rare in real codebases.
+    rare = rng.random() < RARE_FEATURES
+    typing_names = "Any, Dict, Generic, List, Optional, TypeVar, Union" if rare else "Any, Dict, List, Optional, Union"
+    lines = [
+        f"from typing import {typing_names}",
+        "",
+        "from pydantic import BaseModel, Field, conint, constr, root_validator, validator",
+    ]
+    if rare:
+        lines.append("from pydantic.generics import GenericModel")
+    if parent is not None:
+        lines.append(f"from {module_name(parent)} import Model{parent}_0")
+    lines.append("")
+
+    for model in range(models):
+        if model == 0:
+            base = f"Model{parent}_0" if parent is not None else "BaseModel"
+        else:
+            base = f"Model{index}_{rng.randrange(model)}"
+        lines += [
+            "",
+            f"class Model{index}_{model}({base}):",
+            f'    """Model {model} of module {index}."""',
+            "",
+            f"    name_{model}: constr(min_length=1, max_length={rng.randint(10, 100)})",
+            f"    count_{model}: conint(gt=0) = {rng.randint(1, 10)}",
+            f"    tags_{model}: List[str] = Field(default_factory=list, min_items=1, regex='^[a-z]+$')",
+            f"    parent_{model}: Optional[str]",
+            f"    extra_{model}: Union[int, None]",
+            f"    data_{model}: Dict[str, Any] = {{}}",
+            f"    anything_{model}: Any",
+            "",
+        ]
+        if rng.random() < 0.5:
+            lines += [
+                "    class Config:",
+                "        allow_mutation = False",
+                "        orm_mode = True",
+                "        allow_population_by_field_name = True",
+                "",
+            ]
+        lines += [
+            f'    @validator("name_{model}")',
+            f"    def check_name_{model}(cls, v):",
+            "        if not v.strip():",
+            '            raise ValueError("empty")',
+            "        return v",
+            "",
+        ]
+        if rng.random() < 0.3:
+            lines += [
+                "    @root_validator(pre=True)",
+                f"    def check_all_{model}(cls, values):",
+                "        return values",
+                "",
+            ]
+        lines += [
+            f"    def describe_{model}(self) -> str:",
+            f'        return f"{{self.name_{model}}}: {{self.count_{model}}}"',
+            "",
+        ]
+    if rare:
+        lines += rare_features(index)
+    lines += [
+        "",
+        f"def build_{index}(**kwargs: Any) -> Model{index}_0:",
+        f"    return Model{index}_0.parse_obj(kwargs)",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def rare_features(index: int) -> list[str]:
+    """A generic model, a model with a custom root type, and a custom type."""
+    return [
+        "",
+        f'T{index} = TypeVar("T{index}")',
+        "",
+        "",
+        f"class Page{index}(GenericModel, Generic[T{index}]):",
+        f"    items: List[T{index}]",
+        "    total: int",
+        "",
+        "",
+        f"class Names{index}(BaseModel):",
+        "    __root__: List[str]",
+        "",
+        "",
+        f"class Code{index}(str):",
+        "    @classmethod",
+        "    def __get_validators__(cls):",
+        "        yield cls.validate",
+        "",
+        "    @classmethod",
+        "    def __modify_schema__(cls, field_schema):",
+        '        field_schema.update(pattern="^[A-Z]+$")',
+        "",
+        "    @classmethod",
+        "    def validate(cls, v):",
+        "        return cls(v)",
+        "",
+    ]
+
+
+def plain_module(index: int) -> str:
+    return "\n".join(
+        [
+            "import dataclasses",
+            "from typing import List",
+            "",
+            "",
+            "@dataclasses.dataclass",
+            f"class Record{index}:",
+            "    name: str",
+            "    values: List[int]",
+            "",
+            "    def total(self) -> int:",
+            "        return sum(self.values)",
+            "",
+            "",
+            f"def records_{index}(names: List[str]) -> List[Record{index}]:",
+            f"    return [Record{index}(name, list(range(len(name)))) for name in names]",
+            "",
+        ]
+    )
+
+
+def main(
+    root: Path = typer.Argument(..., file_okay=False, help="Write the package in this folder."),
+    modules: int = typer.Option(Shape.modules, min=1, help="Number of modules."),
+    models: int = typer.Option(Shape.models, min=1, help="Number of models in each module that uses Pydantic."),
+    depth: int = typer.Option(Shape.depth, min=1, help="Number of modules crossed by each inheritance chain."),
+    plain: float = typer.Option(Shape.plain, min=0, max=1, help="Fraction of the modules that don't use Pydantic."),
+    seed: int = typer.Option(Shape.seed, help="Seed of the random choices."),
+) -> None:
+    """Generate a synthetic package that uses Pydantic V1."""
+    paths = generate_package(root, Shape(modules, models, depth, plain, seed))
+    typer.echo(f"Generated {len(paths)} modules in {root / PACKAGE}.")
+
+
+if __name__ == "__main__":
+    typer.run(main)
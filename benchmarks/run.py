@@ -0,0 +1,192 @@
+"""
+Time bump-pydantic on synthetic packages of several sizes.
+
+Each benchmark runs on a package made by `benchmarks.generate`, and is repeated to report the best and the median
+time. The benchmarks are:
+- `metadata`: resolving the cache of the `FullRepoManager`.
+- `discovery`: finding the classes defined in each module, to know which ones are Pydantic models.
+- `codemods`: running the codemods on each module, without writing the result.
+- `main`: the whole command, in a new process, writing the result.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import typer
+from libcst.metadata import FullRepoManager, FullyQualifiedNameProvider, ScopeProvider
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.generate import PACKAGE, Shape, generate_package
+from bump_pydantic.codemods.class_def_visitor import ClassDefVisitor, resolve_class_hierarchy
+from bump_pydantic.executor import Executor, Workers
+from bump_pydantic.journal import JournalState
+from bump_pydantic.main import discover_classes, failed_file_result, filter_files, run_codemods
+from bump_pydantic.results import FileResult
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+BENCHMARKS = ("metadata", "discovery", "codemods", "main")
+
+app = typer.Typer(add_completion=False)
+
+
+@contextmanager
+def chdir(path: Path) -> Iterator[None]:
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def run_bump_pydantic(cwd: Path, args: List[str]) -> "subprocess.CompletedProcess[bytes]":
+    """Run the bump-pydantic of this repository in a new process."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(REPOSITORY), os.environ.get("PYTHONPATH", "")])}
+    return subprocess.run([sys.executable, "-m", "bump_pydantic", *args], cwd=cwd, env=env, capture_output=True)
+
+
+def measure(function: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> List[float]:
+    """Return the time of each call of the function. The setup runs before each call, and is not timed."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+class Benchmark:
+    """The state shared by the benchmarks of a package, built in the same order as in `main()`."""
+
+    def __init__(self, root: Path, shape: Shape, workers: Workers) -> None:
+        self.root = root
+        self.shape = shape
+        self.workers = workers
+        self.console = Console(quiet=True)
+        self.files = [str(path.relative_to(root)) for path in generate_package(root, shape)]
+        self.metadata_manager = self.resolve_metadata()
+        self.models: Dict[str, List[str]] = {}
+        self.scratch: Dict[str, Any] = {}
+
+    def resolve_metadata(self) -> FullRepoManager:
+        providers = {FullyQualifiedNameProvider, ScopeProvider}
+        metadata_manager = FullRepoManager(".", self.files, providers=providers)  # type: ignore[arg-type]
+        metadata_manager.resolve_cache()
+        return metadata_manager
+
+    def discover(self) -> None:
+        classes, failures = discover_classes(
+            self.console, self.workers, self.files, self.metadata_manager, None, None, JournalState()
+        )
+        assert not failures, failures
+        self.scratch = resolve_class_hierarchy(
+            {name: bases for file_classes in classes.values() for name, bases in file_classes.items()}
+        )
+        base_model_cls = self.scratch[ClassDefVisitor.BASE_MODEL_CONTEXT_KEY]
+        self.models = {
+            filename: [name for name in file_classes if name in base_model_cls]
+            for filename, file_classes in classes.items()
+        }
+
+    def codemods_function(self) -> Callable[[str], FileResult]:
+        """The function that the workers call on each file, in diff mode."""
+        return partial(
+            run_codemods,
+            [],
+            self.metadata_manager,
+            self.scratch,
+            Path(PACKAGE),
+            True,
+            True,
+            None,
+            self.models,
+            False,
+            False,
+        )
+
+    def run_codemods(self) -> None:
+        files, _ = filter_files(self.files, [], self.models)
+        for result in self.workers.map(self.codemods_function(), files, on_failure=failed_file_result):
+            assert result.error is None, result.error
+
+    def run_main(self) -> None:
+        args = ["--no-cache", "--executor", self.workers.executor.value, "--jobs", str(self.workers.jobs)]
+        run_bump_pydantic(self.root, [*args, "--log-file", os.devnull, PACKAGE]).check_returncode()
+
+    def reset(self) -> None:
+        """Generate the package again, after `main` changed it."""
+        shutil.rmtree(self.root / PACKAGE)
+        generate_package(self.root, self.shape)
+
+
+def run_benchmarks(shape: Shape, workers: Workers, repeat: int, benchmarks: List[str]) -> Dict[str, List[float]]:
+    times: Dict[str, List[float]] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir, chdir(Path(tmp_dir)):
+        benchmark = Benchmark(Path(tmp_dir), shape, workers)
+        if "metadata" in benchmarks:
+            times["metadata"] = measure(benchmark.resolve_metadata, repeat)
+        # NOTE: The codemods need the models found by the discovery.
+        discovery_times = measure(benchmark.discover, repeat)
+        if "discovery" in benchmarks:
+            times["discovery"] = discovery_times
+        if "codemods" in benchmarks:
+            times["codemods"] = measure(benchmark.run_codemods, repeat)
+        if "main" in benchmarks:
+            times["main"] = measure(benchmark.run_main, repeat, setup=benchmark.reset)
+    return times
+
+
+@app.command()
+def main(
+    scale: List[int] = typer.Option([20, 100], help="Number of modules of each package to benchmark."),
+    models: int = typer.Option(Shape.models, min=1, help="Number of models in each module that uses Pydantic."),
+    depth: int = typer.Option(Shape.depth, min=1, help="Number of modules crossed by each inheritance chain."),
+    plain: float = typer.Option(Shape.plain, min=0, max=1, help="Fraction of the modules that don't use Pydantic."),
+    benchmark: List[str] = typer.Option(list(BENCHMARKS), help=f"Benchmarks to run, of: {', '.join(BENCHMARKS)}."),
+    repeat: int = typer.Option(3, min=1, help="Number of times each benchmark runs."),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j", min=1, help="Number of workers."),
+    executor: Executor = typer.Option(Executor.PROCESS, case_sensitive=False, help="How the workers run."),
+    output: Optional[Path] = typer.Option(None, help="Write the times of each run to this JSON file."),
+) -> None:
+    """Time bump-pydantic on synthetic packages of several sizes."""
+    unknown = set(benchmark) - set(BENCHMARKS)
+    if unknown:
+        raise typer.BadParameter(f"Unknown benchmarks: {', '.join(sorted(unknown))}.", param_hint="'--benchmark'")
+
+    console = Console()
+    workers = Workers(executor, jobs)
+    table = Table("Modules", "Benchmark", "Best (s)", "Median (s)", "Modules/s")
+    results = []
+    for modules in scale:
+        shape = Shape(modules, models, depth, plain)
+        with console.status(f"Benchmarking {modules} modules..."):
+            times = run_benchmarks(shape, workers, repeat, benchmark)
+        for name, durations in times.items():
+            best = min(durations)
+            table.add_row(
+                str(modules), name, f"{best:.3f}", f"{statistics.median(durations):.3f}", f"{modules / best:.1f}"
+            )
+            results.append({"modules": modules, "benchmark": name, "times": durations})
+    console.print(table)
+
+    if output is not None:
+        environment = {"python": sys.version, "executor": executor.value, "jobs": workers.jobs}
+        report = {"environment": environment, "shape": {"models": models, "depth": depth, "plain": plain}}
+        output.write_text(json.dumps({**report, "results": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    app()
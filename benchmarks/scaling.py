@@ -0,0 +1,145 @@
+"""
+Run bump-pydantic on the same package with 1, 2, 4, ... workers, to see how it scales with the number of CPUs.
+
+Each run is a new process with `--profile`, in diff mode so the package doesn't change between the runs. For each
+number of workers, the report shows:
+- the speedup compared to one worker, and the parallel efficiency, i.e. the speedup divided by the number of workers;
+- the time of the phases that the workers share: discovering the classes and running the codemods;
+- the time of the work that only the main process does: starting, the other phases, and writing the diffs.
+
+With one worker, everything runs in the main process. With more, the function sent to each worker carries the
+scratch with the class hierarchy, and it's pickled for each worker when they're spawned instead of forked, so the
+time to pickle it is shown too.
+"""
+
+import json
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.generate import PACKAGE, Shape
+from benchmarks.run import Benchmark, chdir, run_bump_pydantic
+from bump_pydantic.executor import Executor, Workers
+
+PARALLEL_PHASES = ("discover classes", "run codemods")
+
+app = typer.Typer(add_completion=False)
+
+
+def worker_counts(max_jobs: int) -> List[int]:
+    """The powers of two up to `max_jobs`, and `max_jobs`."""
+    counts = []
+    jobs = 1
+    while jobs < max_jobs:
+        counts.append(jobs)
+        jobs *= 2
+    return [*counts, max_jobs]
+
+
+def run_profiled(root: Path, jobs: int) -> Tuple[float, Dict[str, float]]:
+    """Run bump-pydantic with the number of workers, and return its time and the time of each phase."""
+    args = ["--no-cache", "--jobs", str(jobs), "--diff-file", os.devnull, "--log-file", os.devnull]
+    start = time.perf_counter()
+    process = run_bump_pydantic(root, [*args, "--profile", "profile.json", PACKAGE])
+    duration = time.perf_counter() - start
+    # NOTE: The exit code is 1 when there are diffs.
+    if process.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(process.returncode, process.args, process.stdout, process.stderr)
+    report = json.loads((root / "profile.json").read_text(encoding="utf-8"))
+    return duration, report["phases"]
+
+
+def measure_scratch(benchmark: Benchmark, repeat: int) -> Tuple[int, float]:
+    """Return the size of the function sent to each worker once pickled, and the best time to pickle it."""
+    function = benchmark.codemods_function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = pickle.dumps(function)
+        times.append(time.perf_counter() - start)
+    return len(data), min(times)
+
+
+def run_benchmarks(shape: Shape, counts: List[int], repeat: int) -> Dict[str, Any]:
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp_dir, chdir(Path(tmp_dir)):
+        benchmark = Benchmark(Path(tmp_dir), shape, Workers(Executor.SERIAL))
+        benchmark.discover()
+        scratch_size, scratch_time = measure_scratch(benchmark, repeat)
+        for jobs in counts:
+            # NOTE: The fastest run is the least affected by the noise of the machine.
+            duration, phases = min((run_profiled(Path(tmp_dir), jobs) for _ in range(repeat)), key=lambda run: run[0])
+            runs.append({"jobs": jobs, "time": duration, "phases": phases})
+    return {"scratch": {"size": scratch_size, "time": scratch_time}, "runs": runs}
+
+
+@app.command()
+def main(
+    modules: int = typer.Option(Shape.modules, min=1, help="Number of modules of the package."),
+    models: int = typer.Option(Shape.models, min=1, help="Number of models in each module that uses Pydantic."),
+    depth: int = typer.Option(Shape.depth, min=1, help="Number of modules crossed by each inheritance chain."),
+    plain: float = typer.Option(Shape.plain, min=0, max=1, help="Fraction of the modules that don't use Pydantic."),
+    max_jobs: int = typer.Option(
+        os.cpu_count() or 1, min=1, help="Largest number of workers. By default, one per CPU."
+    ),
+    repeat: int = typer.Option(3, min=1, help="Number of times each number of workers runs."),
+    output: Optional[Path] = typer.Option(None, help="Write the times of each run to this JSON file."),
+) -> None:
+    """Run bump-pydantic with 1, 2, 4, ... workers, and report how it scales."""
+    console = Console()
+    shape = Shape(modules, models, depth, plain)
+    with console.status(f"Benchmarking {modules} modules..."):
+        results = run_benchmarks(shape, worker_counts(max_jobs), repeat)
+
+    table = Table("Workers", "Time (s)", "Speedup", "Efficiency", "Discovery (s)", "Codemods (s)", "Main only (s)")
+    table.add_column("Diffs (s)")
+    reference = results["runs"][0]["time"]
+    for run in results["runs"]:
+        phases = run["phases"]
+        speedup = reference / run["time"]
+        # NOTE: The diffs are written by the main process while the workers run the codemods.
+        main_only = run["time"] - sum(phases.get(phase, 0.0) for phase in PARALLEL_PHASES)
+        main_only += phases.get("write diffs", 0.0)
+        table.add_row(
+            str(run["jobs"]),
+            f"{run['time']:.3f}",
+            f"{speedup:.2f}x",
+            f"{speedup / run['jobs']:.0%}",
+            f"{phases.get('discover classes', 0.0):.3f}",
+            f"{phases.get('run codemods', 0.0):.3f}",
+            f"{main_only:.3f}",
+            f"{phases.get('write diffs', 0.0):.3f}",
+        )
+    console.print(table)
+    scratch = results["scratch"]
+    console.print(
+        f"The function sent to each worker is {scratch['size'] / 1024:.0f} KiB pickled, in "
+        f"{scratch['time'] * 1000:.1f}ms. It's pickled for each worker with the spawn and forkserver start methods, "
+        f"this platform uses {multiprocessing.get_start_method()}."
+    )
+
+    if output is not None:
+        environment = {
+            "python": sys.version,
+            "cpus": os.cpu_count(),
+            "start_method": multiprocessing.get_start_method(),
+        }
+        report = {
+            "environment": environment,
+            "shape": {"modules": modules, "models": models, "depth": depth, "plain": plain},
+        }
+        output.write_text(json.dumps({**report, **results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    app()
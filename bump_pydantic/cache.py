@@ -0,0 +1,130 @@
+"""
+On-disk cache of the work done by previous runs.
+
+Everything is stored under a directory named after the bump-pydantic version, so a new version never reads
+the results of an older one. The entries are keyed by the hash of the file contents, and the results also by the
+libcst version, since the code they contain is generated by libcst.
+
+Nothing else removes the entries, so `Cache.prune()` runs at the end of each run: it deletes the directories of the
+other versions, and the least recently used results past a total size.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from bump_pydantic import __version__
+
+CACHE_DIR = ".bump_pydantic_cache"
+LIBCST_VERSION = importlib.metadata.version("libcst")
+MAX_RESULTS_SIZE = 256 * 1024 * 1024
+
+ClassesEntries = Dict[str, Tuple[str, Dict[str, List[str]]]]
+"""Maps each filename to the hash of its content, and the bases of the classes defined in it."""
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def result_key(file_hash: str, passes: Iterable[Iterable[str]], models: Iterable[str]) -> str:
+    """The key of the result of running the codemods on a file.
+
+    Besides the content of the file, the result depends on the codemods that run (and how they're grouped in
+    passes), on which of the classes defined in the file are Pydantic models, and on the libcst version that
+    generates the code and applies the import changes.
+    """
+    parts = [LIBCST_VERSION, file_hash, [list(codemods_pass) for codemods_pass in passes], sorted(models)]
+    return content_hash(json.dumps(parts).encode())
+
+
+def create_cache_dir(root: Path) -> None:
+    """Create the cache folder, if it doesn't exist yet, with a `.gitignore` so it's not committed."""
+    if not root.exists():
+        root.mkdir(parents=True, exist_ok=True)
+        (root / ".gitignore").write_text("# Automatically created by bump-pydantic.\n*\n", encoding="utf-8")
+
+
+class Cache:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.path = root / __version__
+
+    def load_classes(self) -> ClassesEntries:
+        try:
+            content = json.loads((self.path / "classes.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        # NOTE: JSON doesn't have tuples, the entries are read back as lists.
+        return {filename: (entry[0], entry[1]) for filename, entry in content.items()}
+
+    def save_classes(self, entries: ClassesEntries) -> None:
+        # NOTE: Entries of files that were deleted are dropped, the others are kept even if they were not part
+        # of this run, so running on a subfolder doesn't invalidate the rest of the cache.
+        entries = {filename: entry for filename, entry in entries.items() if os.path.exists(filename)}
+        self._write(self.path / "classes.json", json.dumps(entries).encode())
+
+    def get_result(self, key: str, code: str) -> tuple[str, dict[str, int]] | None:
+        """Return the code after running the codemods and the edits of each rule, or `None` if it's not cached."""
+        path = self._result_path(key)
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))
+            # NOTE: The modification time tells which results were used recently, see `prune()`.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        # NOTE: The code of unchanged files is stored as `null`, to avoid storing a copy of them.
+        return (code if content["code"] is None else content["code"]), content["edits"]
+
+    def set_result(self, key: str, code: str, output_code: str, edits: dict[str, int]) -> None:
+        content = {"code": None if code == output_code else output_code, "edits": edits}
+        self._write(self._result_path(key), json.dumps(content).encode())
+
+    def prune(self, max_results_size: int = MAX_RESULTS_SIZE) -> None:
+        """Delete the directories of the other versions, and the least recently used results past the size.
+
+        The results are not deleted just because this run didn't use them, so running on a subfolder doesn't
+        invalidate the results of the rest of the package.
+        """
+        if not self.root.is_dir():
+            return
+        for path in self.root.iterdir():
+            if path.is_dir() and path != self.path:
+                shutil.rmtree(path, ignore_errors=True)
+
+        results = []
+        for dirpath, _, filenames in os.walk(self.path / "results"):
+            for filename in filenames:
+                result_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(result_path)
+                except OSError:
+                    continue
+                results.append((stat.st_mtime, stat.st_size, result_path))
+        size = sum(result[1] for result in results)
+        for _, result_size, result_path in sorted(results):
+            if size <= max_results_size:
+                break
+            try:
+                os.remove(result_path)
+            except OSError:
+                continue
+            size -= result_size
+
+    def _result_path(self, key: str) -> Path:
+        return self.path / "results" / key[:2] / key
+
+    def _write(self, path: Path, content: bytes) -> None:
+        create_cache_dir(self.root)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # NOTE: Write to a temporary file first, so a concurrent run never reads a partially written file.
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", delete=False) as fp:
+            fp.write(content)
+        os.replace(fp.name, path)
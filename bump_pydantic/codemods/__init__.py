@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Type
+from typing import Dict, List, Tuple, Type, Union
 
 from libcst.codemod import ContextAwareTransformer
 from libcst.codemod.visitors import AddImportsVisitor, RemoveImportsVisitor
@@ -39,40 +39,92 @@ class Rule(str, Enum):
     """Add type annotations or TODOs to fields without them."""
 
 
-def gather_codemods(disabled: List[Rule]) -> List[Type[ContextAwareTransformer]]:
-    codemods: List[Type[ContextAwareTransformer]] = []
+# NOTE: The order matters, e.g. the `ConFuncCallCommand` needs to run before the `FieldCodemod`.
+RULE_CODEMODS: List[Tuple[Rule, Type[ContextAwareTransformer]]] = [
+    (Rule.BP001, AddDefaultNoneCommand),
+    (Rule.BP002, ReplaceConfigCodemod),
+    (Rule.BP008, ConFuncCallCommand),
+    (Rule.BP003, FieldCodemod),
+    (Rule.BP004, ReplaceImportsCodemod),
+    (Rule.BP005, ReplaceGenericModelCommand),
+    (Rule.BP006, RootModelCommand),
+    (Rule.BP007, ValidatorCodemod),
+    (Rule.BP009, CustomTypeCodemod),
+    (Rule.BP010, AddAnnotationsCommand),
+]
+
+RULE_BY_CODEMOD = {codemod: rule for rule, codemod in RULE_CODEMODS}
+
+CON_FUNC_TOKENS = (
+    b"constr",
+    b"conint",
+    b"confloat",
+    b"condecimal",
+    b"conbytes",
+    b"conlist",
+    b"conset",
+    b"confrozenset",
+)
+
+# A rule can only change a file that contains one of its tokens. The rules without tokens only change the
+# Pydantic models defined in the file.
+RULE_TOKENS: Dict[Rule, Tuple[bytes, ...]] = {
+    Rule.BP001: (),
+    Rule.BP002: (b"Config",),
+    # The `Field` calls can also be created by the `ConFuncCallCommand`.
+    Rule.BP003: (b"Field", *CON_FUNC_TOKENS),
+    Rule.BP004: (b"pydantic",),
+    Rule.BP005: (b"GenericModel",),
+    Rule.BP006: (b"__root__",),
+    Rule.BP007: (b"validator",),
+    Rule.BP008: CON_FUNC_TOKENS,
+    Rule.BP009: (b"__get_validators__", b"__modify_schema__"),
+    Rule.BP010: (),
+}
+
+
+def rule_applies(rule: Rule, content: bytes, has_models: bool) -> bool:
+    """Cheap check on the content of a file, to know if the rule can change it without parsing it."""
+    if not RULE_TOKENS[rule]:
+        return has_models
+    return any(token in content for token in RULE_TOKENS[rule])
+
+
+def gather_codemods(
+    disabled: List[Rule], content: Union[bytes, None] = None, has_models: bool = True
+) -> List[Type[ContextAwareTransformer]]:
+    """Return the codemods of the enabled rules.
+
+    If the content of a file is given, only the codemods that can change it are returned, so it's empty if the
+    file can be skipped.
+    """
+    codemods: List[Type[ContextAwareTransformer]] = [
+        codemod
+        for rule, codemod in RULE_CODEMODS
+        if rule not in disabled and (content is None or rule_applies(rule, content, has_models))
+    ]
+    if not codemods and content is not None:
+        return []
 
-    if Rule.BP001 not in disabled:
-        codemods.append(AddDefaultNoneCommand)
-
-    if Rule.BP002 not in disabled:
-        codemods.append(ReplaceConfigCodemod)
-
-    # The `ConFuncCallCommand` needs to run before the `FieldCodemod`.
-    if Rule.BP008 not in disabled:
-        codemods.append(ConFuncCallCommand)
-
-    if Rule.BP003 not in disabled:
-        codemods.append(FieldCodemod)
-
-    if Rule.BP004 not in disabled:
-        codemods.append(ReplaceImportsCodemod)
-
-    if Rule.BP005 not in disabled:
-        codemods.append(ReplaceGenericModelCommand)
-
-    if Rule.BP006 not in disabled:
-        codemods.append(RootModelCommand)
+    # Those codemods need to be the last ones.
+    codemods.extend([RemoveImportsVisitor, AddImportsVisitor])
+    return codemods
 
-    if Rule.BP007 not in disabled:
-        codemods.append(ValidatorCodemod)
 
-    if Rule.BP009 not in disabled:
-        codemods.append(CustomTypeCodemod)
+# Those codemods need to see the complete output of the codemods that run before them, so they can't share a
+# tree traversal with them:
+# - The `FieldCodemod` needs the `Field` calls created by the `ConFuncCallCommand`.
+# - The `RootModelCommand` needs the `BaseModel` bases created by the `ReplaceGenericModelCommand`.
+# - The `RemoveImportsVisitor` and `AddImportsVisitor` need the imports registered by all the other codemods.
+ORDERED_PASS_CODEMODS = (FieldCodemod, RootModelCommand, RemoveImportsVisitor, AddImportsVisitor)
 
-    if Rule.BP010 not in disabled:
-        codemods.append(AddAnnotationsCommand)
 
-    # Those codemods need to be the last ones.
-    codemods.extend([RemoveImportsVisitor, AddImportsVisitor])
-    return codemods
+def gather_passes(codemods: List[Type[ContextAwareTransformer]]) -> List[List[Type[ContextAwareTransformer]]]:
+    """Group the codemods that can run in a single tree traversal, keeping their order."""
+    passes: List[List[Type[ContextAwareTransformer]]] = []
+    for codemod in codemods:
+        if passes and codemod not in ORDERED_PASS_CODEMODS:
+            passes[-1].append(codemod)
+        else:
+            passes.append([codemod])
+    return passes
@@ -8,12 +8,17 @@ There are two objects in the visitor:
 1. Check if the module visited is a prefix of any `cls.keys()`.
 1.1. If it is, and if any `base_model_cls` is found, remove from `cls`, and add to `base_model_cls`.
 1.2. If it's not, it continues on the `cls`
+
+The same objects can be built in a map-reduce fashion, which is what the CLI does:
+1. `ClassBasesVisitor` collects the bases of each class defined in a single module, so modules can be visited
+   in parallel.
+2. `resolve_class_hierarchy` merges the classes of all the modules, and solves the three objects at once.
 """
 
 from __future__ import annotations
 
-from collections import defaultdict
-from typing import Set, cast
+from collections import defaultdict, deque
+from typing import Any, Iterable, Mapping, Set, cast
 
 import libcst as cst
 from libcst.codemod import CodemodContext, VisitorBasedCodemodCommand
@@ -102,6 +107,73 @@ class ClassDefVisitor(VisitorBasedCodemodCommand):
         return None
 
 
+class ClassBasesVisitor(cst.CSTVisitor):
+    """Collect the fully qualified names of the bases of each class defined in a module."""
+
+    METADATA_DEPENDENCIES = (FullyQualifiedNameProvider,)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.classes: dict[str, list[str]] = {}
+
+    def visit_ClassDef(self, node: cst.ClassDef) -> None:
+        fqn_set = self.get_metadata(FullyQualifiedNameProvider, node)
+
+        if not fqn_set:
+            return None
+
+        fqn: QualifiedName = next(iter(fqn_set))  # type: ignore
+        bases = self.classes.setdefault(fqn.name, [])
+        for arg in node.bases:
+            base_fqn_set = self.get_metadata(FullyQualifiedNameProvider, arg.value) or set()
+            bases.extend(base_fqn.name for base_fqn in cast(Set[QualifiedName], base_fqn_set))
+
+
+def resolve_class_hierarchy(classes: Mapping[str, Iterable[str]]) -> dict[str, Any]:
+    """Solve the `ClassDefVisitor` objects from the bases of every class.
+
+    Differently from the `ClassDefVisitor`, the result doesn't depend on the order the modules are visited.
+    """
+    base_model_cls = {"pydantic.BaseModel", "pydantic.main.BaseModel"}
+    subclasses: dict[str, set[str]] = defaultdict(set)
+    for name, bases in classes.items():
+        for base in bases:
+            subclasses[base].add(name)
+
+    queue = deque(base_model_cls)
+    while queue:
+        for subclass in subclasses.get(queue.popleft(), ()):
+            if subclass not in base_model_cls:
+                base_model_cls.add(subclass)
+                queue.append(subclass)
+
+    # A class is known to not be a `BaseModel` if none of its ancestors is a `BaseModel`, and all of them are known.
+    no_base_model_cls: set[str] = set()
+    pending = {name: set(bases) for name, bases in classes.items() if name not in base_model_cls}
+    queue = deque(name for name, bases in pending.items() if not bases)
+    while queue:
+        name = queue.popleft()
+        no_base_model_cls.add(name)
+        for subclass in subclasses.get(name, ()):
+            unknown_bases = pending.get(subclass)
+            if unknown_bases is not None and name in unknown_bases:
+                unknown_bases.discard(name)
+                if not unknown_bases:
+                    queue.append(subclass)
+
+    cls: dict[str, set[str]] = defaultdict(set)
+    for name, unknown_bases in pending.items():
+        if name not in no_base_model_cls:
+            for base in unknown_bases:
+                cls[base].add(name)
+
+    return {
+        ClassDefVisitor.BASE_MODEL_CONTEXT_KEY: base_model_cls,
+        ClassDefVisitor.NO_BASE_MODEL_CONTEXT_KEY: no_base_model_cls,
+        ClassDefVisitor.CLS_CONTEXT_KEY: cls,
+    }
+
+
 if __name__ == "__main__":
     import os
     import textwrap
@@ -0,0 +1,153 @@
+"""
+Run several codemods in a single traversal of the tree.
+
+Each codemod keeps its own state and matchers, the `FusedCodemod` only dispatches the
+`on_visit`/`on_leave` hooks to all of them, in the order they were given. On leave, each codemod
+receives the node as updated by the previous ones, same as if they were executed one after the other.
+
+Each codemod registers its imports on its own copy of the context's scratch. After the traversal, the imports
+added by each codemod are applied in turn, so the names are added in the same order as if the codemods were
+executed one after the other, and the `AddImportsVisitor` only runs again when several codemods added imports.
+
+The differences with the sequential execution are:
+1. A codemod doesn't see the changes made by the previous codemods when it visits a node.
+2. The imports registered on `RemoveImportsVisitor` are removed once after the traversal, instead of after each
+   codemod.
+3. Anything else a codemod writes in the scratch is not seen by the other codemods.
+
+Codemods that need the complete output of the previous ones need to run in their own pass.
+
+The `FusedCodemod` also counts the edits made by each codemod, i.e. the nodes it replaced or removed, and when
+profiling, it times the hooks of each codemod, the traversal, the resolution of the metadata and the import visitors.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Iterator, Sequence
+
+import libcst as cst
+from libcst import MetadataWrapper
+from libcst._types import CSTNodeT
+from libcst.codemod import Codemod, CodemodContext, ContextAwareTransformer, VisitorBasedCodemodCommand
+from libcst.codemod.visitors import AddImportsVisitor, RemoveImportsVisitor
+
+from bump_pydantic.profiling import timed, timed_method
+
+HOOKS = ("on_visit", "on_leave", "on_visit_attribute", "on_leave_attribute")
+
+
+class FusedCodemod(VisitorBasedCodemodCommand):
+    def __init__(
+        self,
+        context: CodemodContext,
+        codemods: Sequence[type[ContextAwareTransformer]],
+        timings: dict[str, float] | None = None,
+    ) -> None:
+        super().__init__(context)
+
+        self.transformers = [codemod(context=context) for codemod in codemods]
+        # The node in which each transformer stopped visiting the children, if any.
+        self._skip_until: list[cst.CSTNode | None] = [None] * len(self.transformers)
+        self.edits: Counter[type[ContextAwareTransformer]] = Counter()
+        self.timings = timings
+        if timings is not None:
+            # NOTE: The hooks are only wrapped when profiling, so the timing doesn't slow down the other runs.
+            for transformer in self.transformers:
+                for hook in HOOKS:
+                    method = getattr(transformer, hook)
+                    setattr(transformer, hook, timed_method(method, timings, type(transformer).__name__))
+
+    @contextmanager
+    def resolve(self, wrapper: MetadataWrapper) -> Iterator[None]:
+        dependencies = {
+            dependency for transformer in self.transformers for dependency in transformer.get_inherited_dependencies()
+        }
+        with timed(self.timings, "metadata"):
+            self.metadata = wrapper.resolve_many(dependencies)
+        for transformer in self.transformers:
+            transformer.metadata = self.metadata
+        try:
+            yield
+        finally:
+            self.metadata = {}
+            for transformer in self.transformers:
+                transformer.metadata = {}
+
+    def transform_module_impl(self, tree: cst.Module) -> cst.Module:
+        for transformer in self.transformers:
+            scratch = {**self.context.scratch, AddImportsVisitor.CONTEXT_KEY: [], RemoveImportsVisitor.CONTEXT_KEY: []}
+            transformer.context = replace(self.context, scratch=scratch)
+        with timed(self.timings, "traversal"):
+            tree = tree.visit(self)
+        return self._merge_imports(tree)
+
+    def _merge_imports(self, tree: cst.Module) -> cst.Module:
+        """Register the imports of the codemods on the context, and add the imports of all but the last one.
+
+        The `CodemodCommand` then adds the imports of the last codemod, and removes the imports of all of them.
+        """
+        add_key, remove_key = AddImportsVisitor.CONTEXT_KEY, RemoveImportsVisitor.CONTEXT_KEY
+        scratch = self.context.scratch
+        removed = [item for transformer in self.transformers for item in transformer.context.scratch[remove_key]]
+        if removed:
+            scratch[remove_key] = [*scratch.get(remove_key, []), *removed]
+
+        # NOTE: The `AddImportsVisitor` sorts the names it adds to an import, and puts them before the existing
+        # ones. Running it after each codemod gives the names the same order as the sequential execution.
+        added = [transformer.context.scratch[add_key] for transformer in self.transformers]
+        added = [imports for imports in added if imports]
+        for index, imports in enumerate(added):
+            scratch[add_key] = [*scratch.get(add_key, []), *imports]
+            if index < len(added) - 1:
+                tree = self._instantiate_and_run(AddImportsVisitor, tree)
+        return tree
+
+    def _instantiate_and_run(self, transform: type[Codemod], tree: cst.Module) -> cst.Module:
+        # NOTE: This is how the `CodemodCommand` runs the import visitors after the transformation.
+        with timed(self.timings, "imports"):
+            return super()._instantiate_and_run(transform, tree)
+
+    def _active(self) -> Iterator[ContextAwareTransformer]:
+        for transformer, skip_until in zip(self.transformers, self._skip_until):
+            if skip_until is None:
+                yield transformer
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        for index, transformer in enumerate(self.transformers):
+            if self._skip_until[index] is None and not transformer.on_visit(node):
+                self._skip_until[index] = node
+        return any(skip_until is None for skip_until in self._skip_until)
+
+    def on_visit_attribute(self, node: cst.CSTNode, attribute: str) -> None:
+        for transformer in self._active():
+            transformer.on_visit_attribute(node, attribute)
+
+    def on_leave_attribute(self, original_node: cst.CSTNode, attribute: str) -> None:
+        for transformer in self._active():
+            transformer.on_leave_attribute(original_node, attribute)
+
+    def on_leave(self, original_node: CSTNodeT, updated_node: CSTNodeT) -> CSTNodeT | cst.RemovalSentinel:
+        result: CSTNodeT | cst.RemovalSentinel = updated_node
+        node = updated_node
+        for index, transformer in enumerate(self.transformers):
+            skip_until = self._skip_until[index]
+            if skip_until is not None:
+                if skip_until is not original_node:
+                    continue
+                self._skip_until[index] = None
+
+            # NOTE: The transformers always need to leave the nodes they visited, so their matchers are
+            # deactivated. If a previous transformer removed the node, or replaced it by a node of a different
+            # type, the result of the next transformers is ignored.
+            retval = transformer.on_leave(original_node, node)
+            if result is not node:
+                continue
+            if retval is not node:
+                self.edits[type(transformer)] += 1
+            result = retval
+            if isinstance(retval, type(original_node)):
+                node = retval
+        return result
@@ -0,0 +1,117 @@
+"""
+Output of the diffs, as the files are processed.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import sys
+from enum import Enum
+from typing import Generic, Iterable, Iterator, TextIO, TypeVar
+
+from rich.console import Console
+from rich.text import Text
+
+from bump_pydantic.results import FileResult
+
+T = TypeVar("T")
+
+
+class DiffFormat(str, Enum):
+    PATCH = "patch"
+    """Plain unified diff, that can be applied with `git apply -p0`."""
+    COLOR = "color"
+    """Unified diff with the added and removed lines highlighted."""
+    JSON = "json"
+    """One JSON object per line, with the filename, diff and edits per rule of each file."""
+
+
+def resolve_diff_format(diff_format: DiffFormat | None, to_file: bool) -> DiffFormat:
+    """The diff is only colored when it's shown in a terminal."""
+    if diff_format is None:
+        return DiffFormat.COLOR if not to_file and sys.stdout.isatty() else DiffFormat.PATCH
+    if diff_format == DiffFormat.COLOR and to_file:
+        return DiffFormat.PATCH
+    return diff_format
+
+
+class DiffWriter:
+    def __init__(self, diff_format: DiffFormat, fp: TextIO, console: Console) -> None:
+        self.diff_format = diff_format
+        self.fp = fp
+        self.console = console
+
+    def write(self, result: FileResult) -> None:
+        assert result.difflines is not None, "Only the results with a diff can be written."
+        if self.diff_format == DiffFormat.COLOR:
+            color_diff(self.console, result.difflines)
+        elif self.diff_format == DiffFormat.JSON:
+            diff = "".join(patch_lines(result.difflines))
+            self.fp.write(json.dumps({"filename": result.filename, "diff": diff, "edits": result.edits}) + "\n")
+        else:
+            self.fp.writelines(patch_lines(result.difflines))
+
+
+class ReorderBuffer(Generic[T]):
+    """Put back in order the items of the files that are processed out of order.
+
+    At most `size` items wait for the ones before them. When there are more, the first of them is released, even
+    if the previous ones didn't arrive yet, and those are then released as soon as they arrive.
+    """
+
+    def __init__(self, keys: Iterable[str], size: int) -> None:
+        self.size = size
+        self._positions = {key: position for position, key in enumerate(keys)}
+        self._next = 0
+        self._pending: list[tuple[int, T | None]] = []
+
+    def push(self, key: str, item: T | None) -> Iterator[T]:
+        """Add the item of a file, which may be `None` if the file has nothing to output, and release the items
+        that are ready."""
+        position = self._positions[key]
+        if position < self._next:
+            if item is not None:
+                yield item
+            return
+
+        heapq.heappush(self._pending, (position, item))
+        while self._pending and (self._pending[0][0] == self._next or len(self._pending) > self.size):
+            position, item = heapq.heappop(self._pending)
+            self._next = position + 1
+            if item is not None:
+                yield item
+
+    def flush(self) -> Iterator[T]:
+        """Release the items that are still waiting."""
+        while self._pending:
+            _, item = heapq.heappop(self._pending)
+            if item is not None:
+                yield item
+
+
+def patch_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Terminate every line of a diff, marking the ones that had no newline as `patch` and `git apply` expect."""
+    for line in lines:
+        if line.endswith("\n"):
+            yield line
+        else:
+            yield f"{line}\n"
+            yield "\\ No newline at end of file\n"
+
+
+def color_diff(console: Console, lines: Iterable[str]) -> None:
+    # NOTE: The whole diff of the file is rendered at once, as rendering each line separately is slow.
+    text = Text()
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("+"):
+            text.append(line, style="green")
+        elif line.startswith("-"):
+            text.append(line, style="red")
+        elif line.startswith("^"):
+            text.append(line, style="blue")
+        else:
+            text.append(line, style="white")
+        text.append("\n")
+    console.print(text, end="")
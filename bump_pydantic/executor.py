@@ -0,0 +1,342 @@
+"""
+Run a function on each file, in worker processes, in worker threads or serially.
+
+The worker processes are supervised by the main process: if a worker takes too long on a file, it's killed and
+replaced, and the rest of its task is sent to another worker. A worker that processed too many files, or that uses
+too much memory, stops by itself after the current file, and it's replaced the same way.
+"""
+
+from __future__ import annotations
+
+import collections
+import functools
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from multiprocessing.connection import Connection, wait
+from multiprocessing.pool import ThreadPool
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# NOTE: Files smaller than this are sent to the workers in batches, to amortize the cost of each task.
+SMALL_FILE_SIZE = 8 * 1024
+BATCH_SIZE = 64 * 1024
+BATCH_MAX_FILES = 64
+# The batches are small enough to give at least this many tasks to each worker, so the work is spread across all the
+# workers, and no worker is left with a long batch at the end of the run.
+TASKS_PER_WORKER = 4
+
+
+class Executor(str, Enum):
+    PROCESS = "process"
+    THREAD = "thread"
+    """Useful on free-threaded Python builds."""
+    SERIAL = "serial"
+    """Run everything in the main process, e.g. to profile it."""
+
+
+@dataclass
+class WorkerFailure:
+    """A file on which the worker was killed, or died."""
+
+    filename: str
+    elapsed: float
+    timed_out: bool
+
+    def __str__(self) -> str:
+        if self.timed_out:
+            return f"Processing {self.filename} was stopped after {self.elapsed:.1f} seconds.\n"
+        return f"The worker died after {self.elapsed:.1f} seconds processing {self.filename}.\n"
+
+
+@dataclass
+class WorkerStats:
+    """The peak memory of each worker process, and how many of them were replaced because of the limits."""
+
+    peak_rss: list[int] = field(default_factory=list)
+    recycled: int = 0
+
+
+def current_rss() -> int | None:
+    """The memory used by this process, in bytes, or `None` if it can't be measured."""
+    try:
+        with open("/proc/self/statm", "rb") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # NOTE: Without /proc, only the peak memory of the process is available. It's in bytes on macOS and in KiB
+    # on the other platforms.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def default_jobs() -> int:
+    jobs = os.cpu_count() or 1
+    # Windows has a limit of 61 processes. See https://github.com/python/cpython/issues/89240.
+    if platform.system() == "Windows":
+        jobs = min(jobs, 61)
+    return jobs
+
+
+def run_batch(function: Callable[[str], T], filenames: list[str]) -> list[T]:
+    return [function(filename) for filename in filenames]
+
+
+def schedule(files: list[str], jobs: int = 1) -> list[list[str]]:
+    """Group the files in tasks for `jobs` workers, starting with the biggest files.
+
+    Otherwise, a big file that is processed last delays the end of the whole run.
+    """
+    sizes = {filename: _file_size(filename) for filename in files}
+    max_files = min(BATCH_MAX_FILES, max(1, math.ceil(len(files) / (TASKS_PER_WORKER * jobs))))
+    tasks: list[list[str]] = []
+    batch: list[str] = []
+    batch_size = 0
+    for filename in sorted(files, key=sizes.__getitem__, reverse=True):
+        size = sizes[filename]
+        if size >= SMALL_FILE_SIZE:
+            tasks.append([filename])
+            continue
+        if batch and (batch_size + size > BATCH_SIZE or len(batch) == max_files):
+            tasks.append(batch)
+            batch, batch_size = [], 0
+        batch.append(filename)
+        batch_size += size
+    if batch:
+        tasks.append(batch)
+    return tasks
+
+
+def _file_size(filename: str) -> int:
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+class Workers:
+    def __init__(
+        self,
+        executor: Executor = Executor.PROCESS,
+        jobs: int | None = None,
+        timeout: float | None = None,
+        max_rss: int | None = None,
+        max_files: int | None = None,
+    ) -> None:
+        self.executor = executor
+        self.jobs = jobs or default_jobs()
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.max_files = max_files
+
+    def in_process(self, files: list[str]) -> bool:
+        """Check if the files are processed in this process, so their results can be kept in memory."""
+        return self.executor != Executor.PROCESS or self._serial(files)
+
+    def map(
+        self,
+        function: Callable[[str], T],
+        files: list[str],
+        on_failure: Callable[[WorkerFailure], T],
+        stats: WorkerStats | None = None,
+    ) -> Iterator[T]:
+        """Call the function on each file, yielding the results as they're ready.
+
+        If a worker process is killed or dies while processing a file, the result of `on_failure` is yielded
+        instead. The memory of the worker processes, and how many of them were replaced, is added to `stats`.
+        """
+        if self._serial(files):
+            yield from map(function, files)
+            return
+
+        tasks = schedule(files, self.jobs)
+        # NOTE: Starting more workers than tasks is a waste, e.g. when running on a couple of files in pre-commit.
+        jobs = min(self.jobs, len(tasks))
+        if self.executor == Executor.THREAD:
+            with ThreadPool(processes=jobs) as pool:
+                for results in pool.imap_unordered(functools.partial(run_batch, function), tasks):
+                    yield from results
+        else:
+            process_pool = ProcessPool(function, jobs, self.timeout, self.max_rss, self.max_files, stats=stats)
+            yield from process_pool.run(tasks, on_failure)
+
+    def _serial(self, files: list[str]) -> bool:
+        # NOTE: The limits can only be enforced by replacing a worker process.
+        limits = (self.timeout, self.max_rss, self.max_files)
+        if self.executor == Executor.PROCESS and any(limit is not None for limit in limits):
+            return False
+        return self.executor == Executor.SERIAL or self.jobs == 1 or len(files) <= 1
+
+
+def _worker_main(
+    connection: Connection, function: Callable[[str], Any], max_rss: int | None, max_files: int | None
+) -> None:
+    processed = 0
+    while True:
+        filenames = connection.recv()
+        if filenames is None:
+            break
+        for filename in filenames:
+            try:
+                result = function(filename)
+            except BaseException as exc:
+                connection.send((filename, exc, True, current_rss(), False))
+                raise
+            processed += 1
+            rss = current_rss()
+            # NOTE: The worker stops after the file that reached a limit, the main process sends the rest of the
+            # task to another worker.
+            retire = (max_files is not None and processed >= max_files) or (
+                max_rss is not None and rss is not None and rss > max_rss
+            )
+            connection.send((filename, result, False, rss, retire))
+            if retire:
+                return
+
+
+class _Worker:
+    def __init__(self, function: Callable[[str], Any], max_rss: int | None, max_files: int | None) -> None:
+        self.connection, child_connection = multiprocessing.Pipe()
+        # NOTE: The function, with the state shared by all the files, is sent once to each worker.
+        self.process = multiprocessing.Process(
+            target=_worker_main, args=(child_connection, function, max_rss, max_files), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.filenames: collections.deque[str] = collections.deque()
+        self.started = 0.0
+        self.peak_rss = 0
+
+    def send(self, filenames: list[str]) -> None:
+        self.filenames.extend(filenames)
+        self.started = time.monotonic()
+        self.connection.send(filenames)
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join()
+        self.connection.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ProcessPool:
+    """A pool of worker processes, that kills the workers that take more than `timeout` seconds on a file.
+
+    The workers are also replaced after processing `max_files` files, or when they use more than `max_rss` bytes of
+    memory, so the memory that a long run accumulates in a worker is given back.
+    """
+
+    def __init__(
+        self,
+        function: Callable[[str], Any],
+        jobs: int,
+        timeout: float | None = None,
+        max_rss: int | None = None,
+        max_files: int | None = None,
+        stats: WorkerStats | None = None,
+    ) -> None:
+        self.function = function
+        self.jobs = jobs
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.max_files = max_files
+        self.stats = stats if stats is not None else WorkerStats()
+
+    def run(self, tasks: list[list[str]], on_failure: Callable[[WorkerFailure], T]) -> Iterator[T]:
+        pending: collections.deque[list[str]] = collections.deque(tasks)
+        workers = [self._start_worker() for _ in range(self.jobs)]
+        try:
+            while pending or any(worker.filenames for worker in workers):
+                for worker in workers:
+                    if not worker.filenames and pending:
+                        worker.send(pending.popleft())
+
+                busy = {worker.connection: worker for worker in workers if worker.filenames}
+                for connection in wait(list(busy), timeout=self._wait_timeout(busy.values())):
+                    worker = busy[connection]  # type: ignore[index]
+                    try:
+                        filename, result, raised, rss, retire = worker.connection.recv()
+                    except EOFError:
+                        yield self._replace(workers, worker, pending, on_failure, timed_out=False)
+                        continue
+                    worker.peak_rss = max(worker.peak_rss, rss or 0)
+                    if raised:
+                        raise result
+                    worker.filenames.popleft()
+                    worker.started = time.monotonic()
+                    if retire:
+                        self._recycle(workers, worker, pending)
+                    yield result
+
+                for worker in self._timed_out(busy.values()):
+                    yield self._replace(workers, worker, pending, on_failure, timed_out=True)
+        except BaseException:
+            for worker in workers:
+                worker.kill()
+            raise
+        else:
+            for worker in workers:
+                worker.stop()
+        finally:
+            self.stats.peak_rss.extend(worker.peak_rss for worker in workers if worker.peak_rss)
+
+    def _wait_timeout(self, workers: Iterable[_Worker]) -> float | None:
+        if self.timeout is None:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(worker.started + self.timeout - now for worker in workers))
+
+    def _timed_out(self, workers: Iterable[_Worker]) -> list[_Worker]:
+        if self.timeout is None:
+            return []
+        now = time.monotonic()
+        return [worker for worker in workers if worker.filenames and now - worker.started > self.timeout]
+
+    def _replace(
+        self,
+        workers: list[_Worker],
+        worker: _Worker,
+        pending: collections.deque[list[str]],
+        on_failure: Callable[[WorkerFailure], T],
+        timed_out: bool,
+    ) -> T:
+        """Kill the worker, and start a new one. The files it didn't process yet are sent to another worker."""
+        elapsed = time.monotonic() - worker.started
+        worker.kill()
+        filename = worker.filenames.popleft()
+        self._requeue(workers, worker, pending)
+        return on_failure(WorkerFailure(filename, elapsed, timed_out))
+
+    def _recycle(self, workers: list[_Worker], worker: _Worker, pending: collections.deque[list[str]]) -> None:
+        """Start a new worker instead of one that reached a limit, and is stopping by itself."""
+        worker.stop()
+        self.stats.recycled += 1
+        self._requeue(workers, worker, pending)
+
+    def _requeue(self, workers: list[_Worker], worker: _Worker, pending: collections.deque[list[str]]) -> None:
+        if worker.filenames:
+            pending.appendleft(list(worker.filenames))
+            worker.filenames.clear()
+        if worker.peak_rss:
+            self.stats.peak_rss.append(worker.peak_rss)
+        workers[workers.index(worker)] = self._start_worker()
+
+    def _start_worker(self) -> _Worker:
+        return _Worker(self.function, self.max_rss, self.max_files)
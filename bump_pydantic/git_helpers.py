@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+import subprocess
+from pathlib import Path
+
+
+class GitError(Exception):
+    pass
+
+
+def run_git(cwd: Path, *args: str) -> list[str]:
+    """Run a git command, and return the NUL separated paths it outputs."""
+    try:
+        process = subprocess.run(["git", *args], cwd=cwd, capture_output=True, check=True)
+    except FileNotFoundError as exc:
+        raise GitError("git is not installed.") from exc
+    except subprocess.CalledProcessError as exc:
+        raise GitError(exc.stderr.decode(errors="replace").strip()) from exc
+    return [name for name in os.fsdecode(process.stdout).split("\0") if name]
+
+
+def git_python_files(path: Path) -> list[Path]:
+    """List the Python files inside a directory that git doesn't ignore, either tracked or untracked."""
+    names = run_git(path, "ls-files", "-z", "--cached", "--others", "--exclude-standard", "--", "*.py")
+    # NOTE: Files that were deleted but not staged yet are still listed as tracked.
+    return [path / name for name in dict.fromkeys(names) if (path / name).is_file()]
+
+
+def git_changed_python_files(path: Path, ref: str) -> list[Path]:
+    """List the Python files inside a directory that changed since a git ref, including the untracked ones."""
+    names = run_git(path, "diff", "-z", "--name-only", "--relative", "--diff-filter=d", ref, "--", "*.py")
+    names += run_git(path, "ls-files", "-z", "--others", "--exclude-standard", "--", "*.py")
+    return [path / name for name in dict.fromkeys(names) if (path / name).is_file()]
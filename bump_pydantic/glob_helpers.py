@@ -1,7 +1,8 @@
 import fnmatch
+import os
 import re
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Pattern
 
 MATCH_SEP = r"(?:/|\\)"
 MATCH_SEP_OR_END = r"(?:/|\\|\Z)"
@@ -45,3 +46,56 @@ def match_glob(path: Path, pattern: str) -> bool:
     if pattern.endswith("/") or pattern.endswith("\\"):
         return match and path.is_dir()
     return match
+
+
+class GlobSet:
+    """A set of glob patterns, compiled once into a single regular expression.
+
+    Same as `match_glob`, the patterns that end with a directory separator only match directories.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        patterns = list(patterns)
+        self._regex = _compile_patterns(pattern for pattern in patterns if not _is_dir_pattern(pattern))
+        self._dir_regex = _compile_patterns(pattern for pattern in patterns if _is_dir_pattern(pattern))
+        # NOTE: If a pattern ending with `**` matches a directory, it matches everything inside it.
+        self._prune_regex = _compile_patterns(pattern for pattern in patterns if pattern.endswith("**"))
+
+    def match(self, path: Path) -> bool:
+        """Check if a path matches any of the patterns."""
+        if self._regex is not None and self._regex.fullmatch(str(path)):
+            return True
+        return self._dir_regex is not None and bool(self._dir_regex.fullmatch(str(path))) and path.is_dir()
+
+    def match_all_inside(self, path: Path) -> bool:
+        """Check if every path inside a directory matches any of the patterns."""
+        return self._prune_regex is not None and bool(self._prune_regex.fullmatch(str(path)))
+
+
+def _is_dir_pattern(pattern: str) -> bool:
+    return pattern.endswith("/") or pattern.endswith("\\")
+
+
+def _compile_patterns(patterns: Iterable[str]) -> Optional[Pattern[str]]:
+    expressions = [glob_to_re(pattern) for pattern in patterns]
+    return re.compile("|".join(expressions)) if expressions else None
+
+
+def iter_python_files(root: Path, ignore: GlobSet) -> Iterator[Path]:
+    """Yield the Python files inside a directory, skipping the ignored ones.
+
+    The directories in which everything is ignored are not walked.
+    """
+    try:
+        with os.scandir(root) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except PermissionError:
+        return
+    for entry in entries:
+        path = root / entry.name
+        # NOTE: Same as `Path.glob("**/*.py")`, symlinks to directories are not followed.
+        if entry.is_dir(follow_symlinks=False):
+            if not ignore.match_all_inside(path):
+                yield from iter_python_files(path, ignore)
+        elif entry.name.endswith(".py") and not ignore.match(path):
+            yield path
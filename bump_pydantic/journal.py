@@ -0,0 +1,117 @@
+"""
+Append-only journal of the progress of a run, so a run that was interrupted can be resumed.
+
+Each line is a JSON object. The first one describes the run, the next ones record the classes found in a file, and
+the files that were processed with the hash of their content before and after running the codemods. The lines are
+written as soon as each file is processed, and a line that was partially written when the run was interrupted is
+ignored.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
+
+from bump_pydantic.cache import ClassesEntries, create_cache_dir
+from bump_pydantic.results import FileResult
+
+JOURNAL_FILE = "journal.jsonl"
+
+
+@dataclass
+class JournalState:
+    classes: ClassesEntries = field(default_factory=dict)
+    """Maps each filename to the hash of its content, and the bases of the classes defined in it."""
+    done: dict[str, tuple[str, str]] = field(default_factory=dict)
+    """Maps each processed filename to the hash of its content before and after running the codemods."""
+
+    def get_classes(self, filename: str, file_hash: str) -> dict[str, list[str]] | None:
+        """Return the classes found in the file, if it didn't change since, or was only changed by the codemods."""
+        entry = self.classes.get(filename)
+        if entry is None:
+            return None
+        if entry[0] == file_hash or self.done.get(filename) == (entry[0], file_hash):
+            return entry[1]
+        return None
+
+    def is_done(self, filename: str, file_hash: str) -> bool:
+        done = self.done.get(filename)
+        return done is not None and done[1] == file_hash
+
+
+class Journal:
+    def __init__(self, path: Path, header: dict[str, Any]) -> None:
+        self.path = path
+        self.header = header
+        self._fp: IO[str] | None = None
+
+    def read(self) -> JournalState:
+        """Read the state of the previous run, if it was run with the same options."""
+        state = JournalState()
+        try:
+            with self.path.open(encoding="utf-8") as fp:
+                lines = iter(fp)
+                if _parse(next(lines, "")) != {"header": self.header}:
+                    return state
+                for line in lines:
+                    record = _parse(line)
+                    if "classes" in record:
+                        filename, file_hash, classes = record["classes"]
+                        state.classes[filename] = (file_hash, classes)
+                    elif "done" in record:
+                        filename, input_hash, output_hash = record["done"]
+                        state.done[filename] = (input_hash, output_hash)
+        except OSError:
+            pass
+        return state
+
+    def start(self, resume: bool) -> None:
+        """Start writing the journal, after the records of the previous run if it's resumed."""
+        create_cache_dir(self.path.parent)
+        # NOTE: Each line is written as soon as it's complete, so it's not lost if the process is killed.
+        if resume and self._has_header():
+            with self.path.open("rb") as fp:
+                fp.seek(-1, os.SEEK_END)
+                ends_with_newline = fp.read() == b"\n"
+            self._fp = self.path.open("a", encoding="utf-8", newline="\n", buffering=1)
+            if not ends_with_newline:
+                # NOTE: The last line was partially written, it's ended so the next records can be read.
+                self._fp.write("\n")
+        else:
+            self._fp = self.path.open("w", encoding="utf-8", newline="\n", buffering=1)
+            self._write({"header": self.header})
+
+    def add_classes(self, filename: str, file_hash: str, classes: dict[str, list[str]]) -> None:
+        self._write({"classes": [filename, file_hash, classes]})
+
+    def add_result(self, result: FileResult) -> None:
+        """Record the file as processed, unless it couldn't be processed."""
+        if result.hashes is not None:
+            self._write({"done": [result.filename, *result.hashes]})
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def _has_header(self) -> bool:
+        try:
+            with self.path.open(encoding="utf-8") as fp:
+                return _parse(fp.readline()) == {"header": self.header}
+        except OSError:
+            return False
+
+    def _write(self, record: dict[str, Any]) -> None:
+        assert self._fp is not None, "The journal was not started."
+        self._fp.write(json.dumps(record) + "\n")
+
+
+def _parse(line: str) -> dict[str, Any]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return {}
+    return record if isinstance(record, dict) else {}
@@ -1,27 +1,33 @@
 import difflib
 import functools
-import multiprocessing
 import os
-import platform
-import time
+import sys
 import traceback
-from collections import deque
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Set, Tuple, Type, TypeVar, Union
+from typing import Any, Dict, List, TextIO, Tuple, Type, TypeVar, Union
 
 import libcst as cst
-from libcst.codemod import CodemodContext, ContextAwareTransformer
+from libcst.codemod import CodemodCommand, CodemodContext, ContextAwareTransformer
 from libcst.helpers import calculate_module_and_package
-from libcst.metadata import FullRepoManager, FullyQualifiedNameProvider, ScopeProvider
+from libcst.metadata import FullRepoManager, FullyQualifiedNameProvider, MetadataWrapper, ScopeProvider
 from rich.console import Console
 from rich.progress import Progress
-from typer import Argument, Exit, Option, Typer, echo
+from typer import Argument, BadParameter, Exit, Option, Typer, echo
 from typing_extensions import ParamSpec
 
 from bump_pydantic import __version__
-from bump_pydantic.codemods import Rule, gather_codemods
-from bump_pydantic.codemods.class_def_visitor import ClassDefVisitor
-from bump_pydantic.glob_helpers import match_glob
+from bump_pydantic.cache import CACHE_DIR, Cache, content_hash, result_key
+from bump_pydantic.codemods import RULE_BY_CODEMOD, Rule, gather_codemods, gather_passes
+from bump_pydantic.codemods.class_def_visitor import ClassBasesVisitor, ClassDefVisitor, resolve_class_hierarchy
+from bump_pydantic.codemods.fused import FusedCodemod
+from bump_pydantic.diff_output import DiffFormat, DiffWriter, ReorderBuffer, resolve_diff_format
+from bump_pydantic.executor import Executor, WorkerFailure, Workers, WorkerStats
+from bump_pydantic.git_helpers import GitError, git_changed_python_files, git_python_files
+from bump_pydantic.glob_helpers import GlobSet, iter_python_files
+from bump_pydantic.journal import JOURNAL_FILE, Journal, JournalState
+from bump_pydantic.parsed_modules import ParsedModules
+from bump_pydantic.profiling import Profile, Recorder, add_pass_timings, timed
+from bump_pydantic.results import FileResult, Status, Summary
 
 app = Typer(invoke_without_command=True, add_completion=False)
 
@@ -32,11 +38,6 @@ T = TypeVar("T")
 
 DEFAULT_IGNORES = [".venv/**", ".tox/**"]
 
-processes = os.cpu_count()
-# Windows has a limit of 61 processes. See https://github.com/python/cpython/issues/89240.
-if platform.system() == "Windows" and processes is not None:
-    processes = min(processes, 61)
-
 
 def version_callback(value: bool):
     if value:
@@ -44,13 +45,74 @@ def version_callback(value: bool):
         raise Exit()
 
 
+def positive_callback(value: Union[float, None]) -> Union[float, None]:
+    if value is not None and value <= 0:
+        raise BadParameter("The value must be greater than 0.")
+    return value
+
+
 @app.callback()
 def main(
     path: Path = Argument(..., exists=True, dir_okay=True, allow_dash=False),
     disable: List[Rule] = Option(default=[], help="Disable a rule."),
     diff: bool = Option(False, help="Show diff instead of applying changes."),
+    diff_file: Union[Path, None] = Option(None, help="Write the diff to this file instead of showing it."),
+    diff_format: Union[DiffFormat, None] = Option(
+        None,
+        case_sensitive=False,
+        help="Format of the diff. By default, it's colored when shown in a terminal, and a plain patch otherwise.",
+    ),
+    diff_buffer: int = Option(
+        0,
+        min=0,
+        help="Keep up to this many diffs in memory to show them in path order. By default, each diff is shown "
+        "as soon as its file is processed.",
+    ),
     ignore: List[str] = Option(default=DEFAULT_IGNORES, help="Ignore a path glob pattern."),
     log_file: Path = Option("log.txt", help="Log errors to this file."),
+    jobs: Union[int, None] = Option(None, "--jobs", "-j", min=1, help="Number of workers. By default, one per CPU."),
+    executor: Executor = Option(
+        Executor.PROCESS,
+        case_sensitive=False,
+        help="Run the workers as processes, as threads (for free-threaded Python builds) or serially.",
+    ),
+    timeout: Union[float, None] = Option(
+        None,
+        callback=positive_callback,
+        help="Stop processing a file after this many seconds, and skip it. Requires the process executor.",
+    ),
+    max_worker_rss: Union[int, None] = Option(
+        None,
+        min=1,
+        help="Replace a worker once it uses more than this many MiB of memory. Requires the process executor.",
+    ),
+    max_tasks_per_worker: Union[int, None] = Option(
+        None,
+        min=1,
+        help="Replace a worker once it has processed this many files. Requires the process executor.",
+    ),
+    fuse: bool = Option(True, help="Run the rules that don't depend on each other in a single tree traversal."),
+    use_cache: bool = Option(True, "--cache/--no-cache", help="Reuse the results of previous runs."),
+    cache_dir: Path = Option(CACHE_DIR, help="Store the results of each run in this folder."),
+    resume: bool = Option(
+        False, help="Resume an interrupted run: skip the files it already processed, if they didn't change since."
+    ),
+    git: bool = Option(False, help="Only process the files that are not ignored by git."),
+    since: Union[str, None] = Option(
+        None, help="Only refactor the files that changed since this git ref. The others are only read."
+    ),
+    profile_file: Union[Path, None] = Option(
+        None,
+        "--profile",
+        help="Time each phase of the run, each rule and each file, show the slowest ones, and write the timings to "
+        "this JSON file. It makes the run slower.",
+    ),
+    trace_file: Union[Path, None] = Option(
+        None,
+        "--trace",
+        help="Write a timeline of the run to this file, with a track for each worker, in the Chrome trace event "
+        "format. It can be opened with https://ui.perfetto.dev.",
+    ),
     version: bool = Option(
         None,
         "--version",
@@ -63,20 +125,22 @@ def main(
 
     Check the README for more information: https://github.com/pydantic/bump-pydantic.
     """
-    console = Console(log_time=True)
+    check_process_executor_options(
+        executor,
+        {"--timeout": timeout, "--max-worker-rss": max_worker_rss, "--max-tasks-per-worker": max_tasks_per_worker},
+    )
+    diff = diff or diff_file is not None
+    check_resume_options(resume, diff, use_cache)
+    diff_format = resolve_diff_format(diff_format, to_file=diff_file is not None)
+    # NOTE: When the diff is written to the standard output, the logs go to the standard error.
+    console = Console(log_time=True, stderr=diff and diff_file is None and diff_format != DiffFormat.COLOR)
     console.log("Start bump-pydantic.")
     # NOTE: LIBCST_PARSER_TYPE=native is required according to https://github.com/Instagram/LibCST/issues/487.
     os.environ["LIBCST_PARSER_TYPE"] = "native"
 
-    if os.path.isfile(path):
-        package = path.parent
-        all_files = [path]
-    else:
-        package = path
-        all_files = sorted(package.glob("**/*.py"))
-
-    filtered_files = [file for file in all_files if not any(match_glob(file, pattern) for pattern in ignore)]
-    files = [str(file.relative_to(".")) for file in filtered_files]
+    profile = Profile(trace=trace_file is not None)
+    with profile.phase("collect files"):
+        package, files = collect_files(path, ignore, git)
 
     if len(files) == 1:
         console.log("Found 1 file to process.")
@@ -86,145 +150,493 @@ def main(
         console.log("No files to process.")
         raise Exit()
 
-    providers = {FullyQualifiedNameProvider, ScopeProvider}
-    metadata_manager = FullRepoManager(".", files, providers=providers)  # type: ignore[arg-type]
-    metadata_manager.resolve_cache()
-
-    scratch: dict[str, Any] = {}
-    with Progress(*Progress.get_default_columns(), transient=True) as progress:
-        task = progress.add_task(description="Looking for Pydantic Models...", total=len(files))
-        queue = deque(files)
-        visited: Set[str] = set()
-
-        while queue:
-            # Queue logic
-            filename = queue.popleft()
-            visited.add(filename)
+    with profile.phase("resolve metadata cache"):
+        providers = {FullyQualifiedNameProvider, ScopeProvider}
+        metadata_manager = FullRepoManager(".", files, providers=providers)  # type: ignore[arg-type]
+        metadata_manager.resolve_cache()
+
+    cache = Cache(cache_dir) if use_cache else None
+    # NOTE: Only the runs that write the files are journaled, so a `--diff` run doesn't lose the progress of an
+    # interrupted run, and `--no-cache` doesn't create the cache folder.
+    journal, journal_state = (
+        start_journal(cache_dir, disable, resume) if use_cache and not diff else (None, JournalState())
+    )
+    max_rss = max_worker_rss * 1024 * 1024 if max_worker_rss is not None else None
+    workers = Workers(executor, jobs, timeout, max_rss=max_rss, max_files=max_tasks_per_worker)
+    log_fp = log_file.open("a+", encoding="utf8")
+    with profile.phase("discover classes"):
+        classes, failures = discover_classes(
+            console,
+            workers,
+            files,
+            metadata_manager,
+            cache,
+            journal,
+            journal_state,
+            keep_trees=workers.in_process(files),
+        )
+        scratch = resolve_class_hierarchy(
+            {name: bases for file_classes in classes.values() for name, bases in file_classes.items()}
+        )
+    log_discovery_failures(console, failures, log_fp, log_file)
+    base_model_cls = scratch[ClassDefVisitor.BASE_MODEL_CONTEXT_KEY]
+    models = {
+        filename: [name for name in file_classes if name in base_model_cls]
+        for filename, file_classes in classes.items()
+    }
+
+    with profile.phase("filter files"):
+        if since is not None:
+            files = select_changed_files(package, files, since)
+            console.log(f"Found {len(files)} files changed since {since}.")
+
+        files, done = filter_done_files(files, journal_state)
+        if done:
+            console.log(f"Skipped {done} files already processed by the previous run.")
+
+        files, skipped = filter_files(files, disable, models)
+        if skipped:
+            console.log(f"Skipped {skipped} files that don't use Pydantic.")
+        # NOTE: Release the trees of the files that the codemods won't run on.
+        _parsed_modules.keep_only(files)
+
+    partial_run_codemods = functools.partial(
+        run_codemods,
+        disable,
+        metadata_manager,
+        scratch,
+        package,
+        diff,
+        fuse,
+        cache,
+        models,
+        profile_file is not None,
+        trace_file is not None,
+    )
+    summary = Summary(discovery_failures=len(failures))
+    worker_stats = WorkerStats()
+    summary.statuses[Status.SKIPPED] += done + skipped
+    reorder_buffer: ReorderBuffer[FileResult] = ReorderBuffer(files, size=diff_buffer)
+    diff_fp = diff_file.open("w", encoding="utf-8", newline="") if diff_file is not None else None
+    diff_writer = DiffWriter(diff_format, diff_fp or sys.stdout, console)
+    with profile.phase("run codemods"), Progress(
+        *Progress.get_default_columns(), console=console, transient=True
+    ) as progress:
+        task = progress.add_task(description="Executing codemods...", total=len(files))
+        for result in workers.map(partial_run_codemods, files, on_failure=failed_file_result, stats=worker_stats):
             progress.advance(task)
+            summary.add(result)
 
-            # Visitor logic
-            code = Path(filename).read_text(encoding="utf8")
-            module = cst.parse_module(code)
-            module_and_package = calculate_module_and_package(str(package), filename)
-
-            context = CodemodContext(
-                metadata_manager=metadata_manager,
-                filename=filename,
-                full_module_name=module_and_package.name,
-                full_package_name=module_and_package.package,
-                scratch=scratch,
-            )
-            visitor = ClassDefVisitor(context=context)
-            visitor.transform_module(module)
-
-            # Queue logic
-            next_file = visitor.next_file(visited)
-            if next_file is not None:
-                queue.appendleft(next_file)
-
-    start_time = time.time()
+            with profile.phase("write diffs"):
+                for diff_result in reorder_buffer.push(result.filename, result if result.difflines else None):
+                    diff_writer.write(diff_result)
 
-    codemods = gather_codemods(disabled=disable)
+            if result.error is not None:
+                log_fp.writelines(result.error)
+            if journal is not None:
+                journal.add_result(result)
+            profile.add(result)
 
-    log_fp = log_file.open("a+", encoding="utf8")
-    partial_run_codemods = functools.partial(run_codemods, codemods, metadata_manager, scratch, package, diff)
-    with Progress(*Progress.get_default_columns(), transient=True) as progress:
-        task = progress.add_task(description="Executing codemods...", total=len(files))
-        count_errors = 0
-        difflines: List[List[str]] = []
-        with multiprocessing.Pool(processes=processes) as pool:
-            for error, _difflines in pool.imap_unordered(partial_run_codemods, files):
-                progress.advance(task)
+        with profile.phase("write diffs"):
+            for diff_result in reorder_buffer.flush():
+                diff_writer.write(diff_result)
+    close_run(diff_fp, journal, cache, log_fp)
 
-                if _difflines is not None:
-                    difflines.append(_difflines)
+    log_worker_stats(console, worker_stats)
+    write_profile(console, profile, profile_file, trace_file)
+    log_summary(console, summary, log_file, diff)
 
-                if error is not None:
-                    count_errors += 1
-                    log_fp.writelines(error)
+    if diff and summary.statuses[Status.CHANGED]:
+        raise Exit(1)
 
-    modified = [Path(f) for f in files if os.stat(f).st_mtime > start_time]
 
+def close_run(
+    diff_fp: Union[TextIO, None], journal: Union[Journal, None], cache: Union[Cache, None], log_fp: TextIO
+) -> None:
+    """Close the files written by the run, and prune the cache."""
+    if diff_fp is not None:
+        diff_fp.close()
+    if journal is not None:
+        journal.close()
+    if cache is not None:
+        cache.prune()
+    log_fp.close()
+
+
+def start_journal(cache_dir: Path, disable: List[Rule], resume: bool) -> Tuple[Journal, JournalState]:
+    """Start the journal of the run, and return the state of the previous run if it's resumed."""
+    header = {"version": __version__, "disable": sorted(rule.value for rule in disable)}
+    journal = Journal(cache_dir / JOURNAL_FILE, header=header)
+    journal_state = journal.read() if resume else JournalState()
+    journal.start(resume)
+    return journal, journal_state
+
+
+def write_profile(
+    console: Console, profile: Profile, profile_file: Union[Path, None], trace_file: Union[Path, None]
+) -> None:
+    if profile_file is not None:
+        profile.log(console)
+        profile.write(profile_file)
+    if trace_file is not None:
+        profile.write_trace(trace_file)
+        console.log(f"Wrote the trace of the run to {trace_file}.")
+
+
+def log_summary(console: Console, summary: Summary, log_file: Path, diff: bool) -> None:
     if not diff:
-        if modified:
-            console.log(f"Refactored {len(modified)} files.")
+        if summary.statuses[Status.CHANGED]:
+            console.log(f"Refactored {summary.statuses[Status.CHANGED]} files.")
         else:
             console.log("No files were modified.")
 
-    for _difflines in difflines:
-        color_diff(console, _difflines)
+    if summary.edits:
+        edits = ", ".join(f"{rule} ({count})" for rule, count in sorted(summary.edits.items()))
+        console.log(f"Edits per rule: {edits}.")
 
-    if count_errors > 0:
-        console.log(f"Found {count_errors} errors. Please check the {log_file} file.")
-    else:
+    if summary.statuses[Status.TIMEOUT] > 0:
+        console.log(
+            f"Skipped {summary.statuses[Status.TIMEOUT]} files that took too long to process. "
+            f"Please check the {log_file} file."
+        )
+
+    if summary.discovery_failures > 0:
+        console.log(
+            f"Couldn't look for Pydantic models in {summary.discovery_failures} files, the models that inherit from "
+            f"their classes may not be migrated. Please check the {log_file} file."
+        )
+
+    if summary.statuses[Status.ERROR] > 0:
+        console.log(f"Found {summary.statuses[Status.ERROR]} errors. Please check the {log_file} file.")
+    elif summary.discovery_failures == 0:
         console.log("Run successfully!")
 
-    if difflines:
-        raise Exit(1)
+
+def log_discovery_failures(console: Console, failures: List[WorkerFailure], log_fp: TextIO, log_file: Path) -> None:
+    if not failures:
+        return
+    for failure in failures:
+        log_fp.write(f"While looking for Pydantic models: {failure}")
+    console.log(
+        f"[yellow]Couldn't look for Pydantic models in {len(failures)} files that took too long or crashed a worker, "
+        f"so the class hierarchy is incomplete. Please check the {log_file} file."
+    )
+
+
+def log_worker_stats(console: Console, stats: WorkerStats) -> None:
+    if not stats.peak_rss:
+        return
+    peak_rss = sorted(stats.peak_rss)
+    console.log(
+        f"Peak memory of the {len(peak_rss)} workers that ran the codemods: {peak_rss[-1] / 2**20:.0f} MiB at most, "
+        f"{peak_rss[len(peak_rss) // 2] / 2**20:.0f} MiB median."
+    )
+    if stats.recycled:
+        console.log(
+            f"Replaced {stats.recycled} workers that reached the memory or files limit while running the codemods."
+        )
+
+
+def check_process_executor_options(executor: Executor, options: Dict[str, Any]) -> None:
+    if executor == Executor.PROCESS:
+        return
+    for name, value in options.items():
+        if value is not None:
+            raise BadParameter("This option requires the process executor.", param_hint=f"'{name}'")
+
+
+def check_resume_options(resume: bool, diff: bool, use_cache: bool) -> None:
+    if resume and (diff or not use_cache):
+        raise BadParameter("This option requires the cache, and a run that writes the files.", param_hint="'--resume'")
+
+
+def collect_files(path: Path, ignore: List[str], git: bool) -> Tuple[Path, List[str]]:
+    """Return the package, and the files to process inside it."""
+    ignore_set = GlobSet(ignore)
+    if os.path.isfile(path):
+        package = path.parent
+        all_files = [path] if not ignore_set.match(path) else []
+    elif git:
+        package = path
+        try:
+            all_files = sorted(file for file in git_python_files(package) if not ignore_set.match(file))
+        except GitError as exc:
+            raise BadParameter(str(exc), param_hint="'--git'") from exc
+    else:
+        package = path
+        all_files = sorted(iter_python_files(package, ignore_set))
+
+    return package, [str(file.relative_to(".")) for file in all_files]
+
+
+_parsed_modules = ParsedModules()
+
+
+def parse_module(filename: str, code: str) -> cst.Module:
+    module = _parsed_modules.pop(filename, code)
+    return module if module is not None else cst.parse_module(code)
+
+
+def select_changed_files(package: Path, files: List[str], since: str) -> List[str]:
+    try:
+        changed_files = {str(file.relative_to(".")) for file in git_changed_python_files(package, since)}
+    except GitError as exc:
+        raise BadParameter(str(exc), param_hint="'--since'") from exc
+    return [filename for filename in files if filename in changed_files]
+
+
+def filter_done_files(files: List[str], journal_state: JournalState) -> Tuple[List[str], int]:
+    """Drop the files processed by the resumed run, that didn't change since."""
+    pending_files = [
+        filename
+        for filename in files
+        if filename not in journal_state.done
+        or not journal_state.is_done(filename, content_hash(Path(filename).read_bytes()))
+    ]
+    return pending_files, len(files) - len(pending_files)
+
+
+def filter_files(files: List[str], disabled: List[Rule], models: Dict[str, List[str]]) -> Tuple[List[str], int]:
+    """Keep the files that the codemods can change, and count the others."""
+    files_to_transform = [
+        filename
+        for filename in files
+        if gather_codemods(disabled, Path(filename).read_bytes(), has_models=bool(models.get(filename)))
+    ]
+    return files_to_transform, len(files) - len(files_to_transform)
+
+
+def discover_classes(
+    console: Console,
+    workers: Workers,
+    files: List[str],
+    metadata_manager: FullRepoManager,
+    cache: Union[Cache, None],
+    journal: Union[Journal, None],
+    journal_state: JournalState,
+    keep_trees: bool = False,
+) -> Tuple[Dict[str, Dict[str, List[str]]], List[WorkerFailure]]:
+    """Find the bases of the classes defined in each file, and the files on which a worker was killed or died."""
+    failures: List[WorkerFailure] = []
+    entries = cache.load_classes() if cache is not None else {}
+    file_hashes: Dict[str, str] = {}
+    classes: Dict[str, Dict[str, List[str]]] = {}
+    files_to_visit: List[str] = []
+    # NOTE: The hashes are only needed to reuse the classes found by a previous run, or to record them.
+    use_hashes = cache is not None or journal is not None
+    for filename in files:
+        content = Path(filename).read_bytes()
+        if b"class" not in content:
+            classes[filename] = {}
+            continue
+        if not use_hashes:
+            files_to_visit.append(filename)
+            continue
+        file_hashes[filename] = content_hash(content)
+        # NOTE: The files refactored by the resumed run keep the classes found before they were changed.
+        file_classes = journal_state.get_classes(filename, file_hashes[filename])
+        if file_classes is not None:
+            classes[filename] = file_classes
+            continue
+        entry = entries.get(filename)
+        if entry is not None and entry[0] == file_hashes[filename]:
+            classes[filename] = entry[1]
+            if journal is not None:
+                journal.add_classes(filename, *entry)
+            continue
+        files_to_visit.append(filename)
+
+    if files_to_visit:
+        # NOTE: The trees can only be kept if they're parsed in this process.
+        keep_trees = keep_trees and workers.in_process(files_to_visit)
+        partial_collect_class_bases = functools.partial(collect_class_bases, metadata_manager, keep_trees)
+        with Progress(*Progress.get_default_columns(), console=console, transient=True) as progress:
+            task = progress.add_task(description="Looking for Pydantic Models...", total=len(files_to_visit))
+            results = workers.map(
+                partial_collect_class_bases, files_to_visit, on_failure=lambda failure: (failure.filename, failure)
+            )
+            for filename, result in results:
+                progress.advance(task)
+                if isinstance(result, WorkerFailure):
+                    failures.append(result)
+                    classes[filename] = {}
+                    continue
+                classes[filename] = result
+                if journal is not None:
+                    journal.add_classes(filename, file_hashes[filename], result)
+                if cache is not None:
+                    entries[filename] = (file_hashes[filename], result)
+
+    if cache is not None:
+        cache.save_classes(entries)
+
+    return classes, failures
+
+
+def collect_class_bases(
+    metadata_manager: FullRepoManager, keep_tree: bool, filename: str
+) -> Tuple[str, Union[Dict[str, List[str]], WorkerFailure]]:
+    try:
+        with open(filename, encoding="utf-8", newline="") as fp:
+            code = fp.read()
+        module = cst.parse_module(code)
+        wrapper = MetadataWrapper(module, unsafe_skip_copy=True, cache=metadata_manager.get_cache_for_path(filename))
+        visitor = ClassBasesVisitor()
+        wrapper.visit(visitor)
+    except Exception:
+        # NOTE: The error is reported when running the codemods, e.g. a syntax error or a file that isn't UTF-8.
+        return filename, {}
+    if keep_tree:
+        _parsed_modules.add(filename, code, module)
+    return filename, visitor.classes
 
 
 def run_codemods(
-    codemods: List[Type[ContextAwareTransformer]],
+    disabled: List[Rule],
     metadata_manager: FullRepoManager,
     scratch: Dict[str, Any],
     package: Path,
     diff: bool,
+    fuse: bool,
+    cache: Union[Cache, None],
+    models: Dict[str, List[str]],
+    profile: bool,
+    trace: bool,
     filename: str,
-) -> Tuple[Union[str, None], Union[List[str], None]]:
-    try:
-        module_and_package = calculate_module_and_package(str(package), filename)
-        context = CodemodContext(
-            metadata_manager=metadata_manager,
-            filename=filename,
-            full_module_name=module_and_package.name,
-            full_package_name=module_and_package.package,
+) -> FileResult:
+    recorder = Recorder({} if profile else None, [] if trace else None)
+    with recorder.span(filename):
+        result = refactor_file(
+            disabled, metadata_manager, scratch, package, diff, fuse, cache, models, recorder, filename
         )
-        context.scratch.update(scratch)
+    result.timings = recorder.timings
+    result.events = recorder.events
+    return result
+
+
+def refactor_file(
+    disabled: List[Rule],
+    metadata_manager: FullRepoManager,
+    scratch: Dict[str, Any],
+    package: Path,
+    diff: bool,
+    fuse: bool,
+    cache: Union[Cache, None],
+    models: Dict[str, List[str]],
+    recorder: Recorder,
+    filename: str,
+) -> FileResult:
+    try:
+        context = codemod_context(metadata_manager, scratch, package, filename)
 
         file_path = Path(filename)
         with file_path.open("r+", encoding="utf-8", newline="") as fp:
-            code = fp.read()
-            fp.seek(0)
-
-            input_tree = cst.parse_module(code)
-
-            for codemod in codemods:
-                transformer = codemod(context=context)
-                output_tree = transformer.transform_module(input_tree)
-                input_tree = output_tree
-
-            output_code = input_tree.code
-            if code != output_code:
-                if diff:
-                    lines = difflib.unified_diff(
-                        code.splitlines(keepends=True),
-                        output_code.splitlines(keepends=True),
-                        fromfile=filename,
-                        tofile=filename,
+            with recorder.step("read"):
+                code = fp.read()
+                fp.seek(0)
+
+            with recorder.step("filter"):
+                codemods = gather_codemods(disabled, code.encode("utf-8"), has_models=bool(models.get(filename)))
+            if not codemods:
+                return FileResult(filename, Status.SKIPPED)
+
+            passes = gather_passes(codemods) if fuse else [[codemod] for codemod in codemods]
+            input_hash = content_hash(code.encode("utf-8"))
+            cached_result = None
+            if cache is not None:
+                key = result_key(
+                    input_hash,
+                    [[codemod.__name__ for codemod in codemods_pass] for codemods_pass in passes],
+                    models.get(filename, []),
+                )
+                with recorder.step("cache"):
+                    cached_result = cache.get_result(key, code)
+            if cached_result is not None:
+                output_code, edits = cached_result
+            else:
+                with recorder.step("parse"):
+                    input_tree = parse_module(filename, code)
+                output_code, edits = transform_code(context, passes, input_tree, recorder)
+                if cache is not None:
+                    with recorder.step("cache"):
+                        cache.set_result(key, code, output_code, edits)
+
+            if code == output_code:
+                return FileResult(filename, Status.UNCHANGED, edits=edits, hashes=(input_hash, input_hash))
+            hashes = (input_hash, content_hash(output_code.encode("utf-8")))
+            if diff:
+                with recorder.step("diff"):
+                    lines = list(
+                        difflib.unified_diff(
+                            code.splitlines(keepends=True),
+                            output_code.splitlines(keepends=True),
+                            fromfile=filename,
+                            tofile=filename,
+                        )
                     )
-                    return None, list(lines)
-                else:
-                    fp.write(output_code)
-                    fp.truncate()
-        return None, None
+                return FileResult(filename, Status.CHANGED, difflines=lines, edits=edits, hashes=hashes)
+            with recorder.step("write"):
+                fp.write(output_code)
+                fp.truncate()
+            return FileResult(filename, Status.CHANGED, edits=edits, hashes=hashes)
     except cst.ParserSyntaxError as exc:
-        return (
+        error = (
             f"A syntax error happened on {filename}. This file cannot be formatted.\n"
             "Check https://github.com/pydantic/bump-pydantic/issues/124 for more information.\n"
             f"{exc}"
-        ), None
+        )
+        return FileResult(filename, Status.ERROR, error=error)
     except Exception:
-        return f"An error happened on {filename}.\n{traceback.format_exc()}", None
-
-
-def color_diff(console: Console, lines: Iterable[str]) -> None:
-    for line in lines:
-        line = line.rstrip("\n")
-        if line.startswith("+"):
-            console.print(line, style="green")
-        elif line.startswith("-"):
-            console.print(line, style="red")
-        elif line.startswith("^"):
-            console.print(line, style="blue")
-        else:
-            console.print(line, style="white")
+        return FileResult(filename, Status.ERROR, error=f"An error happened on {filename}.\n{traceback.format_exc()}")
+    finally:
+        # NOTE: The tree kept when looking for the classes isn't parsed again when the result is cached.
+        _parsed_modules.discard(filename)
+
+
+def codemod_context(
+    metadata_manager: FullRepoManager, scratch: Dict[str, Any], package: Path, filename: str
+) -> CodemodContext:
+    module_and_package = calculate_module_and_package(str(package), filename)
+    context = CodemodContext(
+        metadata_manager=metadata_manager,
+        filename=filename,
+        full_module_name=module_and_package.name,
+        full_package_name=module_and_package.package,
+    )
+    context.scratch.update(scratch)
+    return context
+
+
+def failed_file_result(failure: WorkerFailure) -> FileResult:
+    return FileResult(failure.filename, Status.TIMEOUT if failure.timed_out else Status.ERROR, error=str(failure))
+
+
+def transform_code(
+    context: CodemodContext,
+    passes: List[List[Type[ContextAwareTransformer]]],
+    input_tree: cst.Module,
+    recorder: Union[Recorder, None] = None,
+) -> Tuple[str, Dict[str, int]]:
+    """Run the passes of codemods on the tree, and count the edits made by each rule.
+
+    If a `recorder` is given, the steps are recorded in it.
+    """
+    recorder = recorder or Recorder()
+    edits: Dict[str, int] = {}
+    for codemods_pass in passes:
+        # NOTE: The import visitors are not commands, if they were wrapped they'd run the import visitors again.
+        if len(codemods_pass) == 1 and not issubclass(codemods_pass[0], CodemodCommand):
+            with recorder.step("imports"):
+                input_tree = codemods_pass[0](context=context).transform_module(input_tree)
+            continue
+        pass_timings: Union[Dict[str, float], None] = {} if recorder.timings is not None else None
+        transformer = FusedCodemod(context=context, codemods=codemods_pass, timings=pass_timings)
+        codemod_names = [codemod.__name__ for codemod in codemods_pass]
+        with recorder.span("pass", codemods=codemod_names), timed(pass_timings, "pass"):
+            input_tree = transformer.transform_module(input_tree)
+        if recorder.timings is not None and pass_timings is not None:
+            add_pass_timings(recorder.timings, pass_timings)
+        for codemod, count in transformer.edits.items():
+            rule = RULE_BY_CODEMOD[codemod].value
+            edits[rule] = edits.get(rule, 0) + count
+    return input_tree.code, edits
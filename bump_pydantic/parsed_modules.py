@@ -0,0 +1,58 @@
+"""
+The trees parsed when looking for the classes, kept for the codemods when they run in this same process.
+
+Each file is then parsed only once. A tree takes a couple hundred times the size of its code in memory, so the trees
+are only kept up to a total size of code: the files that don't fit are parsed again by the codemods, like when they
+run in worker processes.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Iterable
+
+import libcst as cst
+
+MAX_SIZE = 4 * 1024 * 1024
+"""The total size of the code of the kept trees, i.e. about 1 GiB of trees."""
+
+
+class ParsedModules:
+    def __init__(self, max_size: int = MAX_SIZE) -> None:
+        self.max_size = max_size
+        self.size = 0
+        # NOTE: The code is kept to check that the file didn't change in between.
+        self._modules: dict[str, tuple[str, cst.Module]] = {}
+        # NOTE: The trees are added and released by the worker threads when using the thread executor.
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def add(self, filename: str, code: str, module: cst.Module) -> bool:
+        """Keep the tree, unless it doesn't fit in the maximum size."""
+        with self._lock:
+            if self.size + len(code) > self.max_size:
+                return False
+            self.discard(filename)
+            self._modules[filename] = (code, module)
+            self.size += len(code)
+            return True
+
+    def pop(self, filename: str, code: str) -> cst.Module | None:
+        """Release the tree of the file, and return it if its code didn't change."""
+        parsed = self.discard(filename)
+        return parsed[1] if parsed is not None and parsed[0] == code else None
+
+    def discard(self, filename: str) -> tuple[str, cst.Module] | None:
+        with self._lock:
+            parsed = self._modules.pop(filename, None)
+            if parsed is not None:
+                self.size -= len(parsed[0])
+            return parsed
+
+    def keep_only(self, filenames: Iterable[str]) -> None:
+        """Release the trees of the other files."""
+        with self._lock:
+            for filename in set(self._modules).difference(filenames):
+                self.discard(filename)
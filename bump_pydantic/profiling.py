@@ -0,0 +1,159 @@
+"""
+Time spent in each phase of a run, and in each step of processing each file.
+
+The workers time the steps of each file (reading, parsing, resolving the metadata, each codemod, the import
+visitors, writing), and send them to the main process with the result of the file. The main process times its own
+phases, and puts everything together in a report. The same steps can be recorded as trace events, to see them in
+a timeline.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Iterable, Iterator
+
+from rich.console import Console
+
+from bump_pydantic.codemods import RULE_BY_CODEMOD
+from bump_pydantic.results import FileResult
+from bump_pydantic.tracing import complete_event, write_trace
+
+RULE_BY_CODEMOD_NAME = {codemod.__name__: rule.value for codemod, rule in RULE_BY_CODEMOD.items()}
+
+
+@contextmanager
+def timed(timings: dict[str, float] | None, key: str) -> Iterator[None]:
+    """Add the time spent in the block to `timings[key]`, unless `timings` is `None`."""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+
+
+def timed_method(method: Callable[..., Any], timings: dict[str, float], key: str) -> Callable[..., Any]:
+    def wrapper(*args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+
+    return wrapper
+
+
+def add_pass_timings(timings: dict[str, float], pass_timings: dict[str, float]) -> None:
+    """Add the timings of a pass of fused codemods to the timings of the file.
+
+    The time of the whole pass, and of its traversal, include the time of the steps inside them. They're split so
+    each step is counted once: the codemods, the traversal itself, resolving the metadata, the import visitors, and
+    the rest of the pass, mostly copying the tree to wrap it with its metadata.
+    """
+    pass_timings = dict(pass_timings)
+    total = pass_timings.pop("pass", 0.0)
+    traversal = pass_timings.pop("traversal", 0.0)
+    others = pass_timings.get("metadata", 0.0) + pass_timings.get("imports", 0.0)
+    hooks = sum(pass_timings.values()) - others
+    pass_timings["traversal"] = traversal - hooks
+    pass_timings["metadata wrapper"] = total - traversal - others
+    for key, value in pass_timings.items():
+        timings[key] = timings.get(key, 0.0) + value
+
+
+class Recorder:
+    """Records the steps of processing a file, or of the whole run.
+
+    The time of each step is added up in `timings`, and each step is recorded as a trace event in `events`, if they're
+    given. A span is only recorded as a trace event, e.g. for the steps that contain other steps.
+    """
+
+    def __init__(self, timings: dict[str, float] | None = None, events: list[dict[str, Any]] | None = None) -> None:
+        self.timings = timings
+        self.events = events
+
+    def step(self, name: str, **args: Any) -> ContextManager[None]:
+        return self._record(name, args, timings=self.timings)
+
+    def span(self, name: str, **args: Any) -> ContextManager[None]:
+        return self._record(name, args, timings=None)
+
+    @contextmanager
+    def _record(self, name: str, args: dict[str, Any], timings: dict[str, float] | None) -> Iterator[None]:
+        if timings is None and self.events is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + end - start
+            if self.events is not None:
+                self.events.append(complete_event(name, start, end, args))
+
+
+class Profile:
+    def __init__(self, trace: bool = False) -> None:
+        self.phases: dict[str, float] = {}
+        """The time of each phase of the run, in the main process."""
+        self.files: dict[str, dict[str, float]] = {}
+        """The time of each step of processing each file, in the workers."""
+        self.events: list[dict[str, Any]] | None = [] if trace else None
+        """The trace events of the main process and the workers, when tracing."""
+        self._recorder = Recorder(self.phases, self.events)
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return self._recorder.step(name)
+
+    def add(self, result: FileResult) -> None:
+        if result.timings is not None:
+            self.files[result.filename] = result.timings
+        if self.events is not None and result.events is not None:
+            self.events.extend(result.events)
+
+    def report(self) -> dict[str, Any]:
+        steps: Counter[str] = Counter()
+        for timings in self.files.values():
+            steps.update(timings)
+        rules: Counter[str] = Counter()
+        for step, duration in steps.items():
+            if step in RULE_BY_CODEMOD_NAME:
+                rules[RULE_BY_CODEMOD_NAME[step]] += duration
+        files = sorted(self.files.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        return {
+            "phases": self.phases,
+            "steps": dict(steps.most_common()),
+            "rules": dict(rules.most_common()),
+            "files": [
+                {"filename": filename, "total": sum(timings.values()), "steps": timings} for filename, timings in files
+            ],
+        }
+
+    def log(self, console: Console, limit: int = 10) -> None:
+        report = self.report()
+        console.log(f"Time per phase: {_format_timings(report['phases'].items())}.")
+        if report["steps"]:
+            console.log(f"Time per step, over all the files: {_format_timings(report['steps'].items())}.")
+        if report["rules"]:
+            console.log(f"Time per rule, over all the files: {_format_timings(report['rules'].items())}.")
+        if report["files"]:
+            slowest = ((file["filename"], file["total"]) for file in report["files"][:limit])
+            console.log(f"Slowest files: {_format_timings(slowest)}.")
+
+    def write(self, path: Path) -> None:
+        path.write_text(json.dumps(self.report(), indent=2), encoding="utf-8")
+
+    def write_trace(self, path: Path) -> None:
+        write_trace(path, self.events or [])
+
+
+def _format_timings(timings: Iterable[tuple[str, float]]) -> str:
+    return ", ".join(f"{key} ({duration:.3f}s)" for key, duration in timings)
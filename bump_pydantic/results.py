@@ -0,0 +1,46 @@
+"""
+The outcome of processing each file, reported by the workers to the main process.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+
+class Status(str, Enum):
+    CHANGED = "changed"
+    UNCHANGED = "unchanged"
+    ERROR = "error"
+    SKIPPED = "skipped"
+    TIMEOUT = "timeout"
+
+
+@dataclass
+class FileResult:
+    filename: str
+    status: Status
+    error: str | None = None
+    difflines: list[str] | None = None
+    edits: dict[str, int] = field(default_factory=dict)
+    """The number of nodes replaced or removed by each rule."""
+    hashes: tuple[str, str] | None = None
+    """The hash of the content of the file before and after running the codemods."""
+    timings: dict[str, float] | None = None
+    """The time spent in each step of processing the file, when profiling."""
+    events: list[dict[str, Any]] | None = None
+    """The trace events of processing the file, when tracing."""
+
+
+@dataclass
+class Summary:
+    statuses: Counter[Status] = field(default_factory=Counter)
+    edits: Counter[str] = field(default_factory=Counter)
+    discovery_failures: int = 0
+    """The files that took too long or crashed a worker while looking for their classes."""
+
+    def add(self, result: FileResult) -> None:
+        self.statuses[result.status] += 1
+        self.edits.update(result.edits)
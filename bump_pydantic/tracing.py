@@ -0,0 +1,44 @@
+"""
+Timeline of a run, in the Chrome trace event format.
+
+The trace can be opened with https://ui.perfetto.dev or chrome://tracing. Each process has its own track: the main
+process with the phases of the run, and each worker with the files it processed and their steps. The gaps in the
+tracks of the workers are the time they spent waiting for work, or sending the results to the main process.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+
+def complete_event(name: str, start: float, end: float, args: dict[str, Any]) -> dict[str, Any]:
+    """An event with its duration, from the times of `time.perf_counter()` in seconds.
+
+    NOTE: The clock of `time.perf_counter()` is shared by all the processes on the supported platforms, so the
+    events of the workers and the main process can be put on the same timeline.
+    """
+    return {
+        "name": name,
+        "ph": "X",
+        "ts": start * 1_000_000,
+        "dur": (end - start) * 1_000_000,
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "args": args,
+    }
+
+
+def write_trace(path: Path, events: list[dict[str, Any]]) -> None:
+    main_pid = os.getpid()
+    pids = sorted({event["pid"] for event in events} | {main_pid}, key=lambda pid: (pid != main_pid, pid))
+    metadata: list[dict[str, Any]] = []
+    for index, pid in enumerate(pids):
+        name = "main" if pid == main_pid else f"worker {pid}"
+        metadata.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+        metadata.append({"name": "process_sort_index", "ph": "M", "pid": pid, "args": {"sort_index": index}})
+    content = {"traceEvents": [*metadata, *events], "displayTimeUnit": "ms"}
+    path.write_text(json.dumps(content), encoding="utf-8")
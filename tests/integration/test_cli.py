@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import difflib
+import json
+import os
+import subprocess
 from pathlib import Path
+from typing import Any
 
+import pytest
 from typer.testing import CliRunner
 
-from bump_pydantic.main import app
+from bump_pydantic import main
+from bump_pydantic.main import app, collect_class_bases
 
 from .cases import before, expected
 from .folder import Folder
@@ -32,16 +38,293 @@ def find_issue(current: Folder, expected: Folder) -> str:
 
 
 # @pytest.mark.parametrize("before,expected", zip([before, expected]))
-def test_command_line(tmp_path: Path) -> None:
+@pytest.mark.parametrize(
+    "options",
+    [
+        [],
+        ["--no-fuse"],
+        # NOTE: The trees parsed when looking for the classes are reused by the codemods.
+        ["--executor", "serial"],
+        ["--executor", "thread", "--jobs", "2"],
+        ["--timeout", "60"],
+        ["--max-tasks-per-worker", "1", "--jobs", "2"],
+    ],
+)
+def test_command_line(tmp_path: Path, options: list[str]) -> None:
     runner = CliRunner()
 
     with runner.isolated_filesystem(temp_dir=tmp_path) as td:
         before.create_structure(root=Path(td))
 
-        result = runner.invoke(app, [before.name])
+        result = runner.invoke(app, [*options, before.name])
         assert result.exit_code == 0, result.output
-        # assert result.output.endswith("Refactored 4 files.\n")
+        assert "Refactored 14 files." in result.output
+
+        after = Folder.from_structure(Path(td) / before.name)
+
+    assert after == expected, find_issue(after, expected)
+
+
+def test_diff_file(tmp_path: Path) -> None:
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+
+        result = runner.invoke(app, ["--diff-file", "changes.patch", "--diff-buffer", "100", before.name])
+        assert result.exit_code == 1, result.output
+        assert Folder.from_structure(Path(td) / before.name) == before
+
+        subprocess.run(["git", "apply", "-p0", "changes.patch"], cwd=td, check=True)
+        after = Folder.from_structure(Path(td) / before.name)
 
+    assert after == expected, find_issue(after, expected)
+
+
+def test_diff_format(tmp_path: Path) -> None:
+    runner = CliRunner(mix_stderr=False)
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+
+        result = runner.invoke(app, ["--diff", "--diff-format", "json", before.name])
+        assert result.exit_code == 1, result.stderr
+        assert "Run successfully!" in result.stderr
+        filenames = [json.loads(line)["filename"] for line in result.stdout.splitlines()]
+        assert len(filenames) == 14
+
+        result = runner.invoke(app, ["--diff", "--diff-format", "patch", before.name])
+        assert result.exit_code == 1, result.stderr
+        subprocess.run(["git", "apply", "-p0"], input=result.stdout.encode(), cwd=td, check=True)
         after = Folder.from_structure(Path(td) / before.name)
 
     assert after == expected, find_issue(after, expected)
+
+
+def test_profile(tmp_path: Path) -> None:
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+
+        result = runner.invoke(app, ["--diff", "--profile", "profile.json", before.name])
+        assert result.exit_code == 1, result.output
+        assert "Slowest files:" in result.output
+        report = json.loads((Path(td) / "profile.json").read_text(encoding="utf-8"))
+
+    assert list(report["phases"]) == [
+        "collect files",
+        "resolve metadata cache",
+        "discover classes",
+        "filter files",
+        # NOTE: The diffs are written while running the codemods, so the phase ends first.
+        "write diffs",
+        "run codemods",
+    ]
+    assert {"read", "parse", "metadata", "traversal", "diff", "FieldCodemod"} <= set(report["steps"])
+    assert "BP003" in report["rules"]
+    # NOTE: The files that the codemods don't change are also timed.
+    assert len(report["files"]) == 18
+
+
+def test_trace(tmp_path: Path) -> None:
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+
+        result = runner.invoke(app, ["--jobs", "2", "--trace", "trace.json", before.name])
+        assert result.exit_code == 0, result.output
+        events = json.loads((Path(td) / "trace.json").read_text(encoding="utf-8"))["traceEvents"]
+
+    process_names = [event["args"]["name"] for event in events if event["name"] == "process_name"]
+    # NOTE: The small files are split in batches, so both workers get some.
+    assert process_names[0] == "main"
+    assert len(process_names) == 3
+    assert all(name.startswith("worker") for name in process_names[1:])
+    names = {event["name"] for event in events if event["ph"] == "X"}
+    assert {"discover classes", "run codemods", "parse", "pass", "write"} <= names
+
+
+@pytest.mark.parametrize("option", ["--timeout", "--max-worker-rss", "--max-tasks-per-worker"])
+def test_worker_limits_require_process_executor(tmp_path: Path, option: str) -> None:
+    result = CliRunner().invoke(app, ["--executor", "thread", option, "1", str(tmp_path)], env={"COLUMNS": "200"})
+    assert result.exit_code == 2, result.output
+    assert f"Invalid value for '{option}': This option requires the process executor." in result.output
+
+
+@pytest.mark.parametrize("timeout", ["0", "-1"])
+def test_timeout_must_be_positive(tmp_path: Path, timeout: str) -> None:
+    result = CliRunner().invoke(app, ["--timeout", timeout, str(tmp_path)], env={"COLUMNS": "200"})
+    assert result.exit_code == 2, result.output
+    assert "Invalid value for '--timeout': The value must be greater than 0." in result.output
+
+
+def test_file_not_utf8(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    code = "# -*- coding: latin-1 -*-\nfrom pydantic import BaseModel\n\n\nclass A(BaseModel):\n    name: str = 'é'\n"
+    Path("latin.py").write_bytes(code.encode("latin-1"))
+    Path("models.py").write_text(
+        "from typing import Optional\n\nfrom pydantic import BaseModel\n\n\nclass B(BaseModel):\n    b: Optional[int]\n"
+    )
+
+    # NOTE: The file is reported as an error, and the other files are still refactored.
+    result = CliRunner().invoke(app, ["--no-cache", "--executor", "serial", "."])
+    assert result.exit_code == 0, result.output
+    assert "Found 1 errors." in result.output
+    assert "An error happened on latin.py." in Path("log.txt").read_text()
+    assert "b: Optional[int] = None" in Path("models.py").read_text()
+
+
+def test_cached_run(tmp_path: Path) -> None:
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+
+        first_result = runner.invoke(app, ["--diff", before.name])
+        assert first_result.exit_code == 1, first_result.output
+        assert (Path(td) / ".bump_pydantic_cache").is_dir()
+
+        second_result = runner.invoke(app, ["--diff", before.name])
+        assert second_result.exit_code == 1, second_result.output
+
+    def diff_lines(output: str) -> list[str]:
+        return sorted(line for line in output.splitlines() if line.startswith(("+", "-")))
+
+    assert diff_lines(first_result.output) == diff_lines(second_result.output)
+
+
+def test_resume(tmp_path: Path) -> None:
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+        contents = {path: path.read_bytes() for path in sorted(Path(td).glob("**/*.py"))}
+        first_result = runner.invoke(app, [before.name])
+        assert first_result.exit_code == 0, first_result.output
+
+        # NOTE: Restore one of the files, as if the first run had been interrupted before processing it.
+        changed_file = next(path for path, content in contents.items() if path.read_bytes() != content)
+        changed_file.write_bytes(contents[changed_file])
+
+        result = runner.invoke(app, ["--resume", before.name])
+        assert result.exit_code == 0, result.output
+        assert "Refactored 1 files." in result.output
+        assert "files already processed by the previous run." in result.output
+
+        after = Folder.from_structure(Path(td) / before.name)
+
+    assert after == expected, find_issue(after, expected)
+
+
+def test_journal_only_for_runs_that_write(tmp_path: Path) -> None:
+    runner = CliRunner(env={"COLUMNS": "200"})
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+        journal = Path(td) / ".bump_pydantic_cache" / "journal.jsonl"
+
+        result = runner.invoke(app, ["--no-cache", "--diff", before.name])
+        assert result.exit_code == 1, result.output
+        assert not (Path(td) / ".bump_pydantic_cache").exists()
+
+        result = runner.invoke(app, [before.name])
+        assert result.exit_code == 0, result.output
+        content = journal.read_text()
+
+        # NOTE: Inspecting the files doesn't lose the progress of the previous run.
+        result = runner.invoke(app, ["--diff", before.name])
+        assert result.exit_code == 0, result.output
+        assert journal.read_text() == content
+
+        result = runner.invoke(app, ["--resume", "--diff", before.name])
+        assert result.exit_code == 2, result.output
+        assert "Invalid value for '--resume': This option requires the cache" in result.output
+
+
+def test_git_files(tmp_path: Path) -> None:
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+        subprocess.run(["git", "init"], cwd=td, check=True, capture_output=True)
+        Path(td, ".gitignore").write_text(f"{before.name}/\n")
+
+        result = runner.invoke(app, ["--git", "--diff", before.name])
+        assert result.exit_code == 0, result.output
+        assert "No files to process." in result.output
+
+        Path(td, ".gitignore").unlink()
+        result = runner.invoke(app, ["--git", "--diff", before.name])
+        assert result.exit_code == 1, result.output
+
+
+def test_git_files_outside_repository(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path))
+    runner = CliRunner()
+
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        before.create_structure(root=Path(td))
+
+        result = runner.invoke(app, ["--git", before.name])
+        assert result.exit_code == 2, result.output
+        assert "not a git repository" in result.output
+
+
+def test_changed_files_since(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def git(*args: str) -> None:
+        command = ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args]
+        subprocess.run(command, check=True, capture_output=True)
+
+    monkeypatch.chdir(tmp_path)
+    models = "from typing import Optional\n\nfrom pydantic import BaseModel\n\n\nclass A(BaseModel):\n    a: {}\n"
+    user = "from typing import Optional\n\nfrom models import A\n\n\nclass B(A):\n    b: {}\n"
+    Path("models.py").write_text(models.format("int"))
+    Path("user.py").write_text(user.format("int"))
+    git("init")
+    git("add", ".")
+    git("commit", "-m", "Initial commit")
+    Path("models.py").write_text(models.format("Optional[int]"))
+    git("commit", "-am", "Change models")
+    Path("user.py").write_text(user.format("Optional[int]"))
+
+    result = CliRunner().invoke(app, ["--since", "HEAD", "--no-cache", "."])
+    assert result.exit_code == 0, result.output
+    assert "Found 1 files changed since HEAD." in result.output
+    # NOTE: `A` is still found to be a Pydantic model, even though `models.py` didn't change.
+    assert Path("user.py").read_text() == user.format("Optional[int] = None")
+    assert Path("models.py").read_text() == models.format("Optional[int]")
+
+
+def crash_on_models(metadata_manager: Any, keep_tree: bool, filename: str) -> Any:
+    if filename.endswith("models.py"):
+        os._exit(1)
+    return collect_class_bases(metadata_manager, keep_tree, filename)
+
+
+def test_discovery_failure(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "collect_class_bases", crash_on_models)
+    Path("models.py").write_text("from pydantic import BaseModel\n\n\nclass A(BaseModel):\n    a: int\n")
+    Path("user.py").write_text("from models import A\n\n\nclass B(A):\n    b: int\n")
+
+    result = CliRunner(env={"COLUMNS": "200"}).invoke(app, ["--no-cache", "--jobs", "2", "--diff", "."])
+    assert "so the class hierarchy is incomplete" in result.output, result.output
+    assert "Couldn't look for Pydantic models in 1 files" in result.output
+    assert "Run successfully!" not in result.output
+    assert "While looking for Pydantic models: The worker died" in Path("log.txt").read_text()
+
+
+def test_parsed_modules_released(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    Path("models.py").write_text(
+        "from typing import Optional\n\nfrom pydantic import BaseModel\n\n\nclass A(BaseModel):\n    a: Optional[int]\n"
+    )
+    Path("plain.py").write_text("class B:\n    b: int\n")
+
+    # NOTE: The second run gets the result of `models.py` from the cache, without parsing it again.
+    for _ in range(2):
+        result = CliRunner().invoke(app, ["--executor", "serial", "--diff", "."])
+        assert result.exit_code == 1, result.output
+        assert len(main._parsed_modules) == 0
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from bump_pydantic import __version__
+from bump_pydantic.cache import Cache, content_hash, result_key
+
+
+@pytest.fixture(autouse=True)
+def _chdir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+
+
+def test_classes_roundtrip() -> None:
+    Path("a.py").write_text("class A(B): ...", encoding="utf-8")
+    file_hash = content_hash(b"class A(B): ...")
+
+    cache = Cache(Path(".cache"))
+    assert cache.load_classes() == {}
+    cache.save_classes({"a.py": (file_hash, {"a.A": ["b.B"]})})
+
+    assert Cache(Path(".cache")).load_classes() == {"a.py": (file_hash, {"a.A": ["b.B"]})}
+    assert (Path(".cache") / __version__ / "classes.json").exists()
+    assert (Path(".cache") / ".gitignore").read_text(encoding="utf-8").endswith("*\n")
+
+
+def test_deleted_files_are_dropped() -> None:
+    Path("a.py").write_text("", encoding="utf-8")
+    cache = Cache(Path(".cache"))
+    cache.save_classes({"a.py": (content_hash(b""), {}), "b.py": (content_hash(b""), {})})
+
+    assert set(cache.load_classes()) == {"a.py"}
+
+
+def test_corrupted_cache_is_ignored() -> None:
+    path = Path(".cache") / __version__ / "classes.json"
+    path.parent.mkdir(parents=True)
+    path.write_text("{", encoding="utf-8")
+
+    assert Cache(Path(".cache")).load_classes() == {}
+
+
+def test_results_roundtrip() -> None:
+    cache = Cache(Path(".cache"))
+    unchanged_key = result_key(content_hash(b"a = 1\n"), [["FieldCodemod"]], [])
+    changed_key = result_key(content_hash(b"b = 1\n"), [["FieldCodemod"]], [])
+
+    assert cache.get_result(unchanged_key, "a = 1\n") is None
+    cache.set_result(unchanged_key, "a = 1\n", "a = 1\n", {})
+    cache.set_result(changed_key, "b = 1\n", "b = 2\n", {"BP003": 1})
+
+    assert cache.get_result(unchanged_key, "a = 1\n") == ("a = 1\n", {})
+    assert cache.get_result(changed_key, "b = 1\n") == ("b = 2\n", {"BP003": 1})
+
+
+def test_result_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    file_hash = content_hash(b"")
+    key = result_key(file_hash, [["FieldCodemod", "RootModelCommand"]], ["a.A", "a.B"])
+
+    assert key == result_key(file_hash, [["FieldCodemod", "RootModelCommand"]], ["a.B", "a.A"])
+    assert key != result_key(file_hash, [["FieldCodemod"], ["RootModelCommand"]], ["a.A", "a.B"])
+    assert key != result_key(file_hash, [["FieldCodemod", "RootModelCommand"]], ["a.A"])
+    assert key != result_key(content_hash(b"a"), [["FieldCodemod", "RootModelCommand"]], ["a.A", "a.B"])
+
+    monkeypatch.setattr("bump_pydantic.cache.LIBCST_VERSION", "0.0.0")
+    assert key != result_key(file_hash, [["FieldCodemod", "RootModelCommand"]], ["a.A", "a.B"])
+
+
+def test_prune_other_versions() -> None:
+    root = Path(".cache")
+    cache = Cache(root)
+    cache.save_classes({})
+    (root / "0.0.0" / "results").mkdir(parents=True)
+    (root / "journal.jsonl").write_text("", encoding="utf-8")
+
+    cache.prune()
+
+    assert not (root / "0.0.0").exists()
+    assert (root / __version__ / "classes.json").exists()
+    assert (root / "journal.jsonl").exists()
+    assert (root / ".gitignore").exists()
+
+
+def test_prune_least_recently_used_results() -> None:
+    cache = Cache(Path(".cache"))
+    keys = [result_key(content_hash(str(index).encode()), [["FieldCodemod"]], []) for index in range(3)]
+    for index, key in enumerate(keys):
+        cache.set_result(key, "a = 1\n", "a = 2\n", {"BP003": 1})
+        os.utime(cache._result_path(key), (index, index))
+    # NOTE: Reading the oldest result makes it the most recently used.
+    assert cache.get_result(keys[0], "a = 1\n") is not None
+    size = cache._result_path(keys[0]).stat().st_size
+
+    cache.prune(max_results_size=2 * size)
+
+    assert cache.get_result(keys[0], "a = 1\n") is not None
+    assert cache.get_result(keys[1], "a = 1\n") is None
+    assert cache.get_result(keys[2], "a = 1\n") is not None
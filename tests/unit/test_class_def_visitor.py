@@ -1,3 +1,17 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from libcst import MetadataWrapper, parse_module
+from libcst.codemod import CodemodTest
+from libcst.metadata import FullyQualifiedNameProvider
+
+from bump_pydantic.codemods.class_def_visitor import (
+    ClassBasesVisitor,
+    ClassDefVisitor,
+    resolve_class_hierarchy,
+)
+
 # from pathlib import Path
 
 # from libcst import MetadataWrapper, parse_module
@@ -73,3 +87,61 @@
 #         )
 #         results = visitor.context.scratch[ClassDefVisitor.BASE_MODEL_CONTEXT_KEY]
 #         self.assertEqual(results, {"pydantic.BaseModel", "pydantic.main.BaseModel", "some.test.module.Foo"})
+
+
+def gather_class_bases(file_path: str, code: str) -> dict[str, list[str]]:
+    mod = MetadataWrapper(
+        parse_module(CodemodTest.make_fixture_data(code)),
+        cache={
+            FullyQualifiedNameProvider: FullyQualifiedNameProvider.gen_cache(Path(""), [file_path], None).get(
+                file_path, ""
+            )
+        },
+    )
+    visitor = ClassBasesVisitor()
+    mod.visit(visitor)
+    return visitor.classes
+
+
+def test_class_bases() -> None:
+    classes = gather_class_bases(
+        "some/test/module.py",
+        """
+        import pydantic
+        from pydantic import BaseModel
+
+        class Foo(BaseModel):
+            class Config:
+                ...
+
+        class Bar(Foo, pydantic.BaseModel):
+            ...
+        """,
+    )
+    assert classes == {
+        "some.test.module.Foo": ["pydantic.BaseModel"],
+        "some.test.module.Foo.Config": [],
+        "some.test.module.Bar": ["some.test.module.Foo", "pydantic.BaseModel"],
+    }
+
+
+def test_resolve_class_hierarchy() -> None:
+    scratch = resolve_class_hierarchy(
+        {
+            "a.A": ["b.B"],
+            "a.D": ["b.C"],
+            "a.E": ["enum.Enum"],
+            "b.B": ["pydantic.BaseModel"],
+            "b.C": [],
+            "c.F": ["a.A", "a.D"],
+        }
+    )
+    assert scratch[ClassDefVisitor.BASE_MODEL_CONTEXT_KEY] == {
+        "pydantic.BaseModel",
+        "pydantic.main.BaseModel",
+        "a.A",
+        "b.B",
+        "c.F",
+    }
+    assert scratch[ClassDefVisitor.NO_BASE_MODEL_CONTEXT_KEY] == {"a.D", "b.C"}
+    assert scratch[ClassDefVisitor.CLS_CONTEXT_KEY] == {"enum.Enum": {"a.E"}}
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import pytest
+from libcst.codemod.visitors import AddImportsVisitor, RemoveImportsVisitor
+
+from bump_pydantic.codemods import RULE_CODEMODS, Rule, gather_codemods
+from bump_pydantic.codemods.add_annotations import AddAnnotationsCommand
+from bump_pydantic.codemods.add_default_none import AddDefaultNoneCommand
+from bump_pydantic.codemods.con_func import ConFuncCallCommand
+from bump_pydantic.codemods.field import FieldCodemod
+from bump_pydantic.codemods.replace_imports import ReplaceImportsCodemod
+from bump_pydantic.codemods.validator import ValidatorCodemod
+
+
+def test_gather_codemods() -> None:
+    codemods = gather_codemods(disabled=[Rule.BP002])
+    assert codemods == [
+        *(codemod for rule, codemod in RULE_CODEMODS if rule != Rule.BP002),
+        RemoveImportsVisitor,
+        AddImportsVisitor,
+    ]
+
+
+@pytest.mark.parametrize(
+    ("content", "has_models", "expected"),
+    [
+        (b"import os\n\nprint(os.getcwd())\n", False, []),
+        (b"from project.compat import validator\n", False, [ValidatorCodemod]),
+        (b"from pydantic import conlist\n", False, [ConFuncCallCommand, FieldCodemod, ReplaceImportsCodemod]),
+        (b"class A(Base):\n    a: int\n", False, []),
+        (b"class A(Base):\n    a: int\n", True, [AddDefaultNoneCommand, AddAnnotationsCommand]),
+    ],
+)
+def test_gather_codemods_for_content(content: bytes, has_models: bool, expected: list[type]) -> None:
+    codemods = gather_codemods(disabled=[], content=content, has_models=has_models)
+    if expected:
+        expected = [*expected, RemoveImportsVisitor, AddImportsVisitor]
+    assert codemods == expected
+
+
+def test_disabled_rules_are_not_applied() -> None:
+    content = b"from project.compat import validator\n"
+    assert gather_codemods(disabled=[Rule.BP007], content=content, has_models=False) == []
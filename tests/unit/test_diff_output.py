@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+from rich.console import Console
+
+from bump_pydantic.diff_output import (
+    DiffFormat,
+    DiffWriter,
+    ReorderBuffer,
+    color_diff,
+    patch_lines,
+    resolve_diff_format,
+)
+from bump_pydantic.results import FileResult, Status
+
+DIFFLINES = ["--- a.py\n", "+++ a.py\n", "@@ -1 +1 @@\n", "-a = 1\n", "+a = 2\n"]
+
+
+def test_reorder_buffer() -> None:
+    buffer: ReorderBuffer[str] = ReorderBuffer(["a", "b", "c", "d"], size=4)
+    assert list(buffer.push("c", "C")) == []
+    assert list(buffer.push("b", None)) == []
+    assert list(buffer.push("a", "A")) == ["A", "C"]
+    assert list(buffer.push("d", "D")) == ["D"]
+    assert list(buffer.flush()) == []
+
+
+def test_full_reorder_buffer() -> None:
+    buffer: ReorderBuffer[str] = ReorderBuffer(["a", "b", "c", "d"], size=1)
+    assert list(buffer.push("d", "D")) == []
+    # NOTE: `C` is released before `a` and `b` arrive, and then `D` follows it.
+    assert list(buffer.push("c", "C")) == ["C", "D"]
+    assert list(buffer.push("a", "A")) == ["A"]
+    assert list(buffer.push("b", "B")) == ["B"]
+    assert list(buffer.flush()) == []
+
+
+def test_unbuffered() -> None:
+    buffer: ReorderBuffer[str] = ReorderBuffer(["a", "b"], size=0)
+    assert list(buffer.push("b", "B")) == ["B"]
+    assert list(buffer.push("a", "A")) == ["A"]
+    assert list(buffer.flush()) == []
+
+
+def test_patch_lines() -> None:
+    lines = ["--- a.py\n", "+++ a.py\n", "@@ -1 +1 @@\n", "-a = 1", "+a = 2"]
+    assert list(patch_lines(lines)) == [
+        "--- a.py\n",
+        "+++ a.py\n",
+        "@@ -1 +1 @@\n",
+        "-a = 1\n",
+        "\\ No newline at end of file\n",
+        "+a = 2\n",
+        "\\ No newline at end of file\n",
+    ]
+
+
+@pytest.mark.parametrize(
+    ("diff_format", "to_file", "isatty", "expected"),
+    [
+        (None, False, True, DiffFormat.COLOR),
+        (None, False, False, DiffFormat.PATCH),
+        (None, True, True, DiffFormat.PATCH),
+        (DiffFormat.COLOR, True, True, DiffFormat.PATCH),
+        (DiffFormat.COLOR, False, False, DiffFormat.COLOR),
+        (DiffFormat.JSON, True, False, DiffFormat.JSON),
+    ],
+)
+def test_resolve_diff_format(
+    diff_format: DiffFormat | None, to_file: bool, isatty: bool, expected: DiffFormat, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("sys.stdout.isatty", lambda: isatty)
+    assert resolve_diff_format(diff_format, to_file) == expected
+
+
+def test_write_patch() -> None:
+    fp = io.StringIO()
+    DiffWriter(DiffFormat.PATCH, fp, Console()).write(FileResult("a.py", Status.CHANGED, difflines=DIFFLINES))
+    assert fp.getvalue() == "".join(DIFFLINES)
+
+
+def test_write_json() -> None:
+    fp = io.StringIO()
+    writer = DiffWriter(DiffFormat.JSON, fp, Console())
+    writer.write(FileResult("a.py", Status.CHANGED, difflines=DIFFLINES, edits={"BP001": 1}))
+    writer.write(FileResult("b.py", Status.CHANGED, difflines=DIFFLINES))
+    lines = fp.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"filename": "a.py", "diff": "".join(DIFFLINES), "edits": {"BP001": 1}},
+        {"filename": "b.py", "diff": "".join(DIFFLINES), "edits": {}},
+    ]
+
+
+def test_color_diff() -> None:
+    console = Console(file=io.StringIO(), force_terminal=True, color_system="standard", width=80)
+    color_diff(console, [*DIFFLINES, "+[red]not markup[/red]\n"])
+    output = console.file.getvalue()  # type: ignore[attr-defined]
+    assert "\x1b[32m+a = 2" in output
+    assert "\x1b[31m-a = 1" in output
+    assert "[red]not markup[/red]" in output
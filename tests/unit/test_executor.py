@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from bump_pydantic.executor import (
+    BATCH_MAX_FILES,
+    SMALL_FILE_SIZE,
+    Executor,
+    ProcessPool,
+    WorkerFailure,
+    Workers,
+    WorkerStats,
+    current_rss,
+    schedule,
+)
+
+
+def pid_of(filename: str) -> tuple[str, int]:
+    return filename, os.getpid()
+
+
+@pytest.mark.parametrize("executor", list(Executor))
+def test_map(executor: Executor) -> None:
+    files = [f"{index}.py" for index in range(10)]
+    results = dict(Workers(executor, jobs=2).map(pid_of, files, on_failure=failed))
+    assert sorted(results) == sorted(files)
+    assert (set(results.values()) == {os.getpid()}) == (executor != Executor.PROCESS)
+
+
+def test_map_stats() -> None:
+    workers = Workers(Executor.PROCESS, jobs=2)
+    files = [f"{index}.py" for index in range(10)]
+    for _ in range(2):
+        # NOTE: Each call only counts its own workers.
+        stats = WorkerStats()
+        list(workers.map(pid_of, files, on_failure=failed, stats=stats))
+        assert len(stats.peak_rss) == 2
+
+
+def test_in_process() -> None:
+    assert not Workers(Executor.PROCESS, jobs=2).in_process(["a.py", "b.py"])
+    assert Workers(Executor.PROCESS, jobs=2).in_process(["a.py"])
+    assert Workers(Executor.PROCESS, jobs=1).in_process(["a.py", "b.py"])
+    assert Workers(Executor.THREAD, jobs=2).in_process(["a.py", "b.py"])
+    assert Workers(Executor.SERIAL).in_process(["a.py", "b.py"])
+
+
+def test_schedule(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    sizes = {"big.py": 4 * SMALL_FILE_SIZE, "bigger.py": 8 * SMALL_FILE_SIZE, "small.py": 10, "smaller.py": 1}
+    for filename, size in sizes.items():
+        Path(filename).write_bytes(b"#" * size)
+    empty_files = [f"empty_{index}.py" for index in range(BATCH_MAX_FILES)]
+    for filename in empty_files:
+        Path(filename).touch()
+
+    # NOTE: The 69 files are split in batches of up to 18 files, to give 4 tasks to the worker.
+    tasks = schedule([*sorted(sizes), *empty_files, "deleted.py"])
+    assert tasks == [
+        ["bigger.py"],
+        ["big.py"],
+        ["small.py", "smaller.py", *empty_files[:16]],
+        empty_files[16:34],
+        empty_files[34:52],
+        [*empty_files[52:], "deleted.py"],
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 4, 16, 64])
+def test_schedule_spreads_small_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, jobs: int) -> None:
+    monkeypatch.chdir(tmp_path)
+    files = [f"module_{index}.py" for index in range(40)]
+    for filename in files:
+        Path(filename).write_text("x = 1\n")
+
+    tasks = schedule(files, jobs)
+    assert len(tasks) >= min(jobs, len(files))
+    assert sorted(filename for task in tasks for filename in task) == sorted(files)
+
+
+def failed(failure: WorkerFailure) -> tuple[str, str]:
+    return failure.filename, str(failure)
+
+
+def slow(filename: str) -> tuple[str, str]:
+    if filename.startswith("slow"):
+        time.sleep(60)
+    if filename.startswith("crash"):
+        os._exit(1)
+    return filename, "done"
+
+
+def test_timeout() -> None:
+    pool = ProcessPool(slow, jobs=2, timeout=0.5)
+    results = dict(pool.run([["a.py", "slow.py", "b.py"], ["c.py"], ["d.py"]], on_failure=failed))
+    assert results.pop("slow.py").startswith("Processing slow.py was stopped after 0.")
+    assert results == {"a.py": "done", "b.py": "done", "c.py": "done", "d.py": "done"}
+
+
+def test_crash() -> None:
+    pool = ProcessPool(slow, jobs=1)
+    results = dict(pool.run([["crash.py", "a.py"]], on_failure=failed))
+    assert results.pop("crash.py").startswith("The worker died after")
+    assert results == {"a.py": "done"}
+
+
+def raises(filename: str) -> str:
+    raise ValueError(filename)
+
+
+def test_exception() -> None:
+    with pytest.raises(ValueError, match="a.py"):
+        list(ProcessPool(raises, jobs=1).run([["a.py"]], on_failure=failed))
+
+
+def test_max_files() -> None:
+    stats = WorkerStats()
+    pool = ProcessPool(pid_of, jobs=2, max_files=2, stats=stats)
+    results = dict(pool.run([["a.py", "b.py", "c.py"], ["d.py"], ["e.py", "f.py"]], on_failure=failed))
+    assert sorted(results) == ["a.py", "b.py", "c.py", "d.py", "e.py", "f.py"]
+    assert results["a.py"] == results["b.py"] != results["c.py"]
+    assert stats.recycled >= 2
+    assert len(stats.peak_rss) >= stats.recycled
+
+
+def test_max_rss() -> None:
+    stats = WorkerStats()
+    pool = ProcessPool(pid_of, jobs=1, max_rss=1, stats=stats)
+    results = dict(pool.run([["a.py", "b.py", "c.py"]], on_failure=failed))
+    assert len(set(results.values())) == 3
+    assert stats.recycled == 3
+    assert all(rss > 1 for rss in stats.peak_rss)
+
+
+def test_current_rss() -> None:
+    rss = current_rss()
+    assert rss is None or rss > 1024 * 1024
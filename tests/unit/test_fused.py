@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import textwrap
+from pathlib import Path
+from typing import Callable
+
+import libcst as cst
+import pytest
+from libcst.codemod import CodemodContext, ContextAwareTransformer
+from libcst.codemod.visitors import AddImportsVisitor, RemoveImportsVisitor
+from libcst.metadata import FullRepoManager, FullyQualifiedNameProvider
+
+from bump_pydantic.codemods import Rule, gather_codemods, gather_passes
+from bump_pydantic.codemods.class_def_visitor import ClassDefVisitor
+from bump_pydantic.codemods.con_func import ConFuncCallCommand
+from bump_pydantic.codemods.custom_types import CustomTypeCodemod
+from bump_pydantic.codemods.field import FieldCodemod
+from bump_pydantic.codemods.fused import FusedCodemod
+from bump_pydantic.codemods.replace_config import ReplaceConfigCodemod
+from bump_pydantic.codemods.replace_generic_model import ReplaceGenericModelCommand
+from bump_pydantic.codemods.replace_imports import ReplaceImportsCodemod
+from bump_pydantic.codemods.root_model import RootModelCommand
+from bump_pydantic.codemods.validator import ValidatorCodemod
+
+SOURCE = textwrap.dedent(
+    """
+    from typing import Generic, TypeVar
+
+    from pydantic import BaseModel, BaseSettings, Extra, Field, conlist, validator
+    from pydantic.generics import GenericModel
+
+    T = TypeVar("T")
+
+
+    class Settings(BaseSettings):
+        name: str = Field(..., env="NAME")
+
+        class Config:
+            orm_mode = True
+
+
+    class Potato(BaseModel):
+        a: conlist(int, min_items=1)
+
+        class Config:
+            extra = Extra.forbid
+
+        @validator("a", pre=True)
+        def validate_a(cls, v):
+            return v
+
+
+    class Response(GenericModel, Generic[T]):
+        data: T
+
+
+    class Color:
+        @classmethod
+        def __get_validators__(cls):
+            yield cls.validate
+    """
+)
+
+
+def run_sequential(
+    code: str,
+    codemods: list[type[ContextAwareTransformer]],
+    make_context: Callable[[], CodemodContext] = CodemodContext,
+) -> str:
+    tree = cst.parse_module(code)
+    context = make_context()
+    for codemod in codemods:
+        tree = codemod(context=context).transform_module(tree)
+    return tree.code
+
+
+def run_fused(
+    code: str,
+    codemods: list[type[ContextAwareTransformer]],
+    make_context: Callable[[], CodemodContext] = CodemodContext,
+) -> str:
+    tree = cst.parse_module(code)
+    context = make_context()
+    for codemods_pass in gather_passes(codemods):
+        tree = FusedCodemod(context=context, codemods=codemods_pass).transform_module(tree)
+    return tree.code
+
+
+def test_gather_passes() -> None:
+    codemods = gather_codemods(disabled=[Rule.BP001, Rule.BP010])
+    assert gather_passes(codemods) == [
+        [ReplaceConfigCodemod, ConFuncCallCommand],
+        [FieldCodemod, ReplaceImportsCodemod, ReplaceGenericModelCommand],
+        [RootModelCommand, ValidatorCodemod, CustomTypeCodemod],
+        [RemoveImportsVisitor],
+        [AddImportsVisitor],
+    ]
+
+
+def test_fused_matches_sequential() -> None:
+    codemods = gather_codemods(disabled=[Rule.BP001, Rule.BP010])
+    assert run_fused(SOURCE, codemods) == run_sequential(SOURCE, codemods)
+
+
+def test_fused_imports_match_sequential(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # NOTE: `ReplaceConfigCodemod` and `ConFuncCallCommand` run in the same pass, and both add names to the
+    # `from pydantic import ...` statement. Applying them at once would sort them together.
+    code = textwrap.dedent(
+        """
+        from typing import Optional
+
+        from pydantic import BaseModel, constr, validator
+
+
+        class Potato(BaseModel):
+            a: constr(min_length=1)
+            b: Optional[int]
+            c = 1
+
+            class Config:
+                orm_mode = True
+
+            @validator("a")
+            def validate_a(cls, v):
+                return v
+        """
+    )
+    monkeypatch.chdir(tmp_path)
+    Path("module.py").write_text(code, encoding="utf-8")
+    metadata_manager = FullRepoManager(".", ["module.py"], {FullyQualifiedNameProvider})
+
+    def make_context() -> CodemodContext:
+        context = CodemodContext(metadata_manager=metadata_manager, filename="module.py", full_module_name="module")
+        context.scratch[ClassDefVisitor.BASE_MODEL_CONTEXT_KEY] = {"module.Potato"}
+        return context
+
+    codemods = gather_codemods(disabled=[])
+    output = run_fused(code, codemods, make_context)
+    assert output == run_sequential(code, codemods, make_context)
+    assert "from pydantic import field_validator, StringConstraints, ConfigDict, BaseModel\n" in output
+    assert "    b: Optional[int] = None\n" in output
+    assert "    c: int = 1\n" in output
+
+
+def test_removed_node_is_not_passed_to_next_codemods() -> None:
+    code = textwrap.dedent(
+        """
+        from pydantic import BaseModel
+        from pydantic.settings import BaseSettings
+
+
+        class Root(BaseModel):
+            __root__ = int
+        """
+    )
+    codemods: list[type[ContextAwareTransformer]] = [RootModelCommand, ReplaceImportsCodemod, ValidatorCodemod]
+    tree = cst.parse_module(code)
+    context = CodemodContext()
+    output = FusedCodemod(context=context, codemods=codemods).transform_module(tree)
+    assert output.code == textwrap.dedent(
+        """
+        from pydantic import RootModel
+        from pydantic_settings import BaseSettings
+
+
+        class Root(RootModel[int]):
+            pass
+        """
+    )
+
+
+def test_edits_are_counted_per_codemod() -> None:
+    code = textwrap.dedent(
+        """
+        from pydantic import BaseModel, validator
+
+
+        class Potato(BaseModel):
+            a: int
+
+            @validator("a")
+            def validate_a(cls, v):
+                return v
+        """
+    )
+    tree = cst.parse_module(code)
+    fused = FusedCodemod(context=CodemodContext(), codemods=[ValidatorCodemod, ReplaceConfigCodemod])
+    fused.transform_module(tree)
+    assert fused.edits == {ValidatorCodemod: 2}
+
+
+def test_timings() -> None:
+    code = textwrap.dedent(
+        """
+        from pydantic import BaseModel, validator
+
+
+        class Potato(BaseModel):
+            a: int
+
+            @validator("a")
+            def validate_a(cls, v):
+                return v
+        """
+    )
+    timings: dict[str, float] = {}
+    fused = FusedCodemod(context=CodemodContext(), codemods=[ValidatorCodemod, ReplaceConfigCodemod], timings=timings)
+    fused.transform_module(cst.parse_module(code))
+    assert set(timings) == {"ValidatorCodemod", "ReplaceConfigCodemod", "metadata", "traversal", "imports"}
+    assert timings["traversal"] >= timings["ValidatorCodemod"] + timings["ReplaceConfigCodemod"]
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from bump_pydantic.git_helpers import GitError, git_changed_python_files, git_python_files
+
+
+def git(cwd: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture()
+def repo(tmp_path: Path) -> Path:
+    git(tmp_path, "init")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "Test")
+    for name in ["a.py", "pkg/b.py", "pkg/c.txt", "build/d.py", "deleted.py"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).touch()
+    (tmp_path / ".gitignore").write_text("build/\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-m", "Initial commit")
+    (tmp_path / "deleted.py").unlink()
+    (tmp_path / "pkg" / "untracked.py").touch()
+    return tmp_path
+
+
+def test_git_python_files(repo: Path) -> None:
+    assert sorted(git_python_files(repo)) == [repo / "a.py", repo / "pkg/b.py", repo / "pkg/untracked.py"]
+    assert sorted(git_python_files(repo / "pkg")) == [repo / "pkg/b.py", repo / "pkg/untracked.py"]
+
+
+def test_git_changed_python_files(repo: Path) -> None:
+    assert git_changed_python_files(repo, "HEAD") == [repo / "pkg/untracked.py"]
+
+    (repo / "pkg" / "b.py").write_text("b = 1\n")
+    (repo / "pkg" / "c.txt").write_text("c\n")
+    assert sorted(git_changed_python_files(repo, "HEAD")) == [repo / "pkg/b.py", repo / "pkg/untracked.py"]
+    assert git_changed_python_files(repo / "pkg", "HEAD") == [repo / "pkg/b.py", repo / "pkg/untracked.py"]
+
+    with pytest.raises(GitError, match="potato"):
+        git_changed_python_files(repo, "potato")
+
+
+def test_not_a_repository(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path))
+    with pytest.raises(GitError, match="not a git repository"):
+        git_python_files(tmp_path)
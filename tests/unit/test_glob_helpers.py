@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
+from typing import Iterator
 
 import pytest
 
-from bump_pydantic.glob_helpers import glob_to_re, match_glob
+from bump_pydantic.glob_helpers import GlobSet, glob_to_re, iter_python_files, match_glob
 
 
 class TestGlobHelpers:
@@ -68,3 +70,45 @@ class TestGlobHelpers:
     def test_match_glob(self, pattern: str, path: Path, expected: bool):
         expr = glob_to_re(pattern)
         assert match_glob(path, pattern) == expected, f"path: {path}, pattern: {pattern}, expr: {expr}"
+
+    @pytest.mark.parametrize(("pattern", "path", "expected"), match_glob_values)
+    def test_glob_set_single_pattern(self, pattern: str, path: Path, expected: bool):
+        assert GlobSet([pattern]).match(path) == expected
+
+    def test_glob_set(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        Path("dirs/foo").mkdir(parents=True)
+        Path("dirs/qux").touch()
+        glob_set = GlobSet(["foo/*", "**/bar", "dirs/*/", "baz/**"])
+        assert glob_set.match(Path("foo/qux"))
+        assert glob_set.match(Path("a/b/bar"))
+        assert glob_set.match(Path("dirs/foo"))
+        assert not glob_set.match(Path("dirs/qux"))
+        assert not glob_set.match(Path("qux"))
+        assert glob_set.match_all_inside(Path("baz"))
+        assert not glob_set.match_all_inside(Path("foo"))
+        assert not GlobSet([]).match(Path("foo"))
+
+    def test_iter_python_files(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        for name in ["a.py", "b.txt", "pkg/c.py", "pkg/sub/d.py", ".venv/lib/e.py", "tests/f.py", "tests/g.py"]:
+            Path(name).parent.mkdir(parents=True, exist_ok=True)
+            Path(name).touch()
+        ignore = [".venv/**", "tests/g.py"]
+
+        expected = sorted(
+            file for file in Path(".").glob("**/*.py") if not any(match_glob(file, pattern) for pattern in ignore)
+        )
+
+        walked: list[str] = []
+        scandir = os.scandir
+
+        def tracked_scandir(path: str) -> Iterator[os.DirEntry[str]]:
+            walked.append(str(path))
+            return scandir(path)
+
+        monkeypatch.setattr(os, "scandir", tracked_scandir)
+
+        files = list(iter_python_files(Path("."), GlobSet(ignore)))
+        assert files == expected == [Path("a.py"), Path("pkg/c.py"), Path("pkg/sub/d.py"), Path("tests/f.py")]
+        assert ".venv" not in walked
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from bump_pydantic.cache import content_hash
+from bump_pydantic.journal import Journal, JournalState
+from bump_pydantic.results import FileResult, Status
+
+HEADER = {"version": "1.0.0", "disable": []}
+
+
+def test_roundtrip(tmp_path: Path) -> None:
+    journal = Journal(tmp_path / "journal.jsonl", HEADER)
+    journal.start(resume=False)
+    journal.add_classes("a.py", "hash_a", {"a.A": ["pydantic.BaseModel"]})
+    journal.add_result(FileResult("a.py", Status.CHANGED, hashes=("hash_a", "hash_a2")))
+    journal.add_result(FileResult("b.py", Status.ERROR, error="..."))
+    journal.close()
+
+    state = Journal(tmp_path / "journal.jsonl", HEADER).read()
+    assert state == JournalState(
+        classes={"a.py": ("hash_a", {"a.A": ["pydantic.BaseModel"]})}, done={"a.py": ("hash_a", "hash_a2")}
+    )
+    assert state.is_done("a.py", "hash_a2")
+    assert not state.is_done("a.py", "hash_a")
+    assert not state.is_done("b.py", "hash_b")
+    # NOTE: The classes of a file changed by the codemods are the ones found before the change.
+    assert state.get_classes("a.py", "hash_a") == {"a.A": ["pydantic.BaseModel"]}
+    assert state.get_classes("a.py", "hash_a2") == {"a.A": ["pydantic.BaseModel"]}
+    assert state.get_classes("a.py", "other") is None
+
+
+def test_resume(tmp_path: Path) -> None:
+    path = tmp_path / "cache" / "journal.jsonl"
+    journal = Journal(path, HEADER)
+    journal.start(resume=True)
+    journal.add_result(FileResult("a.py", Status.UNCHANGED, hashes=("hash_a", "hash_a")))
+    journal.close()
+    # NOTE: The last line was partially written when the run was interrupted.
+    with path.open("a", encoding="utf-8") as fp:
+        fp.write('{"done": ["b.py", "ha')
+
+    journal = Journal(path, HEADER)
+    journal.start(resume=True)
+    journal.add_result(FileResult("c.py", Status.UNCHANGED, hashes=("hash_c", "hash_c")))
+    journal.close()
+
+    assert set(Journal(path, HEADER).read().done) == {"a.py", "c.py"}
+    assert (tmp_path / "cache" / ".gitignore").exists()
+
+    journal = Journal(path, HEADER)
+    journal.start(resume=False)
+    journal.close()
+    assert Journal(path, HEADER).read() == JournalState()
+
+
+def test_other_options_are_ignored(tmp_path: Path) -> None:
+    journal = Journal(tmp_path / "journal.jsonl", HEADER)
+    journal.start(resume=False)
+    journal.add_result(FileResult("a.py", Status.UNCHANGED, hashes=(content_hash(b""), content_hash(b""))))
+    journal.close()
+
+    other_journal = Journal(tmp_path / "journal.jsonl", {**HEADER, "disable": ["BP001"]})
+    assert other_journal.read() == JournalState()
+    other_journal.start(resume=True)
+    other_journal.close()
+    assert Journal(tmp_path / "journal.jsonl", HEADER).read() == JournalState()
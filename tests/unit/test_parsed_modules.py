@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import libcst as cst
+
+from bump_pydantic.parsed_modules import ParsedModules
+
+
+def test_max_size() -> None:
+    parsed_modules = ParsedModules(max_size=10)
+    code = "x = 1\n"
+    module = cst.parse_module(code)
+
+    assert parsed_modules.add("a.py", code, module)
+    # NOTE: The second tree would go over the maximum size.
+    assert not parsed_modules.add("b.py", code, module)
+    assert parsed_modules.size == len(code)
+
+    assert parsed_modules.pop("a.py", code) is module
+    assert parsed_modules.size == 0
+    assert parsed_modules.add("b.py", code, module)
+
+
+def test_pop_changed_code() -> None:
+    parsed_modules = ParsedModules()
+    parsed_modules.add("a.py", "x = 1\n", cst.parse_module("x = 1\n"))
+
+    assert parsed_modules.pop("a.py", "x = 2\n") is None
+    assert len(parsed_modules) == 0
+    assert parsed_modules.size == 0
+
+
+def test_keep_only() -> None:
+    parsed_modules = ParsedModules()
+    for filename in ["a.py", "b.py", "c.py"]:
+        parsed_modules.add(filename, "x = 1\n", cst.parse_module("x = 1\n"))
+
+    parsed_modules.keep_only(["b.py", "d.py"])
+    assert len(parsed_modules) == 1
+    assert parsed_modules.size == len("x = 1\n")
+    assert parsed_modules.pop("b.py", "x = 1\n") is not None
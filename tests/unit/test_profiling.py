@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from bump_pydantic.profiling import Profile, Recorder, add_pass_timings, timed
+from bump_pydantic.results import FileResult, Status
+
+
+def test_timed() -> None:
+    timings: dict[str, float] = {}
+    with timed(timings, "a"):
+        pass
+    with timed(timings, "a"):
+        pass
+    with timed(None, "a"):
+        pass
+    assert list(timings) == ["a"]
+    assert timings["a"] >= 0
+
+
+def test_recorder() -> None:
+    recorder = Recorder({}, [])
+    with recorder.span("a.py"):
+        with recorder.step("parse"):
+            pass
+        with recorder.step("parse"):
+            pass
+    assert recorder.timings is not None
+    assert list(recorder.timings) == ["parse"]
+    assert recorder.events is not None
+    assert [event["name"] for event in recorder.events] == ["parse", "parse", "a.py"]
+
+    recorder = Recorder()
+    with recorder.step("parse"):
+        pass
+    assert recorder.timings is None
+    assert recorder.events is None
+
+
+def test_add_pass_timings() -> None:
+    timings = {"parse": 1.0, "FieldCodemod": 1.0}
+    pass_timings = {
+        "pass": 10.0,
+        "metadata": 2.0,
+        "traversal": 5.0,
+        "imports": 1.0,
+        "FieldCodemod": 3.0,
+        "ValidatorCodemod": 1.0,
+    }
+    add_pass_timings(timings, pass_timings)
+    assert timings == {
+        "parse": 1.0,
+        "metadata": 2.0,
+        "traversal": 1.0,
+        "imports": 1.0,
+        "FieldCodemod": 4.0,
+        "ValidatorCodemod": 1.0,
+        "metadata wrapper": 2.0,
+    }
+    assert sum(timings.values()) == 10.0 + 2.0
+
+
+def test_report(tmp_path: Path) -> None:
+    profile = Profile()
+    with profile.phase("run codemods"):
+        profile.add(FileResult("a.py", Status.CHANGED, timings={"parse": 1.0, "FieldCodemod": 2.0}))
+        profile.add(FileResult("b.py", Status.CHANGED, timings={"parse": 4.0, "ValidatorCodemod": 0.5}))
+        profile.add(FileResult("c.py", Status.TIMEOUT))
+
+    report = profile.report()
+    assert list(report["phases"]) == ["run codemods"]
+    assert report["steps"] == {"parse": 5.0, "FieldCodemod": 2.0, "ValidatorCodemod": 0.5}
+    assert report["rules"] == {"BP003": 2.0, "BP007": 0.5}
+    assert [(file["filename"], file["total"]) for file in report["files"]] == [("b.py", 4.5), ("a.py", 3.0)]
+
+    profile.write(tmp_path / "profile.json")
+    assert json.loads((tmp_path / "profile.json").read_text(encoding="utf-8")) == report
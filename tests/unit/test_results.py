@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from bump_pydantic.results import FileResult, Status, Summary
+
+
+def test_summary() -> None:
+    summary = Summary()
+    summary.add(FileResult("a.py", Status.CHANGED, edits={"BP001": 2, "BP007": 1}))
+    summary.add(FileResult("b.py", Status.CHANGED, edits={"BP001": 1}))
+    summary.add(FileResult("c.py", Status.UNCHANGED))
+    summary.add(FileResult("d.py", Status.ERROR, error="An error happened on d.py."))
+
+    assert summary.statuses == {Status.CHANGED: 2, Status.UNCHANGED: 1, Status.ERROR: 1}
+    assert summary.edits == {"BP001": 3, "BP007": 1}
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from bump_pydantic.tracing import complete_event, write_trace
+
+
+def test_complete_event() -> None:
+    event = complete_event("parse", 1.5, 1.75, {"filename": "a.py"})
+    assert event["ph"] == "X"
+    assert (event["ts"], event["dur"]) == (1_500_000, 250_000)
+    assert event["pid"] == os.getpid()
+    assert event["args"] == {"filename": "a.py"}
+
+
+def test_write_trace(tmp_path: Path) -> None:
+    events = [
+        {**complete_event("parse", 1.0, 2.0, {}), "pid": 1},
+        complete_event("run codemods", 0.0, 3.0, {}),
+    ]
+    write_trace(tmp_path / "trace.json", events)
+
+    content = json.loads((tmp_path / "trace.json").read_text(encoding="utf-8"))
+    names = {event["pid"]: event["args"]["name"] for event in content["traceEvents"] if event["name"] == "process_name"}
+    assert names == {os.getpid(): "main", 1: "worker 1"}
+    assert [event for event in content["traceEvents"] if event["ph"] == "X"] == events